@@ -16,6 +16,9 @@ Classes:
     Console: A utility class for controlling the console.
     Wait: A utility class for waiting-related functions.
     Shout: A utility class for message-related functions.
+    CsvIndex: A persistent index from column values to row offsets in a csv file.
+    CsvMap: A memory-mapped csv file with lazy row views.
+    CsvQuery: A streaming filter, projection and aggregation query over a csv file.
 
 Functions:
     println(text, newlines=1): Prints a line of text and then prints a specified number of newlines.
@@ -24,6 +27,15 @@ Functions:
     typewriter(text, speed=0.2): Prints a line of text with a typewriter effect (one character at a time).
     random_string(length=16, chars=string.printable): Generates a random string of a specified length.
     reverse(iterable): Reverses a list, string, or dictionary.
+    read_csv(file, lazy=False): Reads a csv file into a list of rows.
+    iter_csv(file, chunk_size=None): Streams the rows of a csv file.
+    read_csv_columns(file, keys=None, dtypes=None, cache=False): Reads columns of a csv file into typed NumPy arrays.
+    get_csv_rows(key, values, file, unique=False): Gets the rows matching any of several values from a csv file.
+    read_csv_parallel(file, keys=None, workers=None): Reads a csv file (or some of its columns) across worker processes.
+    query(file): Starts a streaming query over a csv file.
+    sort_csv(source, destination, key, numeric=False): Sorts a csv file by a column, using bounded memory.
+    join_csv(left, right, on, how="inner"): Joins two csv files on one or more columns.
+    dedup_csv(source, destination, key): Removes rows with duplicate keys from a csv file, using bounded memory.
 """
 __version__ = "0.5.0"
 import time
@@ -32,6 +44,20 @@ import random
 import json
 import csv
 import os
+import itertools
+import shutil
+import io
+import gzip
+import bz2
+import lzma
+import heapq
+import hashlib
+from math import log
+import mmap
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
 
 from .brush import Brush
 
@@ -511,23 +537,127 @@ def random_string(length=16, chars=string.printable):
     return "".join(random.choice(chars) for i in range(length))
 
 
+# Compression modules by file extension and by magic bytes.
+COMPRESSION_EXTENSIONS = {".gz": gzip, ".bz2": bz2, ".xz": lzma, ".lzma": lzma}
+COMPRESSION_MAGIC = {b"\x1f\x8b": gzip, b"BZh": bz2, b"\xfd7zXZ\x00": lzma}
+
+
+def _compression(file, mode="r"):
+    """
+    Detects the compression of a file from its extension (or, when reading, its magic bytes).
+
+    Args:
+        file (str): The file.
+        mode (str, optional): The mode the file will be opened in. Defaults to "r".
+
+    Returns:
+        module: `gzip`, `bz2` or `lzma` (or None if the file is not compressed).
+    """
+    extension = os.path.splitext(file)[1].lower()
+    if extension in COMPRESSION_EXTENSIONS:
+        return COMPRESSION_EXTENSIONS[extension]
+    if "r" in mode and os.path.isfile(file):
+        with open(file, "rb") as f:
+            head = f.read(6)
+        for magic, module in COMPRESSION_MAGIC.items():
+            if head.startswith(magic):
+                return module
+    return None
+
+
+def _open(file, mode="r", buffering=-1, newline=None, compression="", compresslevel=None):
+    """
+    Opens a file in text mode, transparently (de)compressing gzip, bz2 and xz files.
+
+    Args:
+        file (str): The file.
+        mode (str, optional): "r", "w" or "a". Defaults to "r".
+        buffering (int, optional): The buffer size (uncompressed files only). Defaults to -1.
+        newline (str, optional): The newline mode (see `open`). Defaults to None.
+        compression (module, optional): `gzip`, `bz2`, `lzma` or None. Defaults to detecting it from `file`.
+        compresslevel (int, optional): The compression level when writing. Defaults to the module's default.
+
+    Returns:
+        file: The open file.
+    """
+    if compression == "":
+        compression = _compression(file, mode)
+    if compression is None:
+        return open(file, mode, buffering=buffering, newline=newline)
+    options = {}
+    if compresslevel is not None and "r" not in mode:
+        options["preset" if compression is lzma else "compresslevel"] = compresslevel
+    return compression.open(file, mode + "t", newline=newline, **options)
+
+
+def _require_uncompressed(file):
+    """
+    Rejects compressed files where the reader needs byte offsets into the file.
+
+    Args:
+        file (str): The file.
+
+    Raises:
+        ValueError: If the file is gzip, bz2 or xz compressed.
+
+    Returns:
+        None
+    """
+    compression = _compression(file)
+    if compression is not None:
+        raise ValueError(
+            f"Compressed ({compression.__name__}) files are not supported here: {file} (decompress it first)"
+        )
+
+
+def _temporary(file):
+    """
+    Creates a temporary file next to a file, to be renamed over it once written.
+
+    The temporary file gets the mode of `file` (or, if `file` does not exist yet, the mode
+    `open` would give it; `mkstemp` creates files as 0600).
+
+    Args:
+        file (str): The file.
+
+    Returns:
+        str: The path of the temporary file.
+    """
+    descriptor, temporary = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(file)), suffix=".tmp"
+    )
+    os.close(descriptor)
+    if os.path.exists(file):
+        shutil.copymode(file, temporary)
+    else:
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temporary, 0o666 & ~umask)
+    return temporary
+
+
 def read_json(file):
     try:
-        with open(file, "r") as f:
+        with _open(file, "r") as f:
             return json.load(f)
     except FileNotFoundError:
         Shout.error(f"Issue reading file: {file}\nMake sure it exists.")
         return None
 
 
-def copy_csv(source, destination, strip_empty=True):
+def copy_csv(source, destination, strip_empty=True, chunk_size=1 << 20):
     """
     Copy a csv file.
 
+    Without `strip_empty` the file is copied by the kernel (`shutil.copyfile`);
+    otherwise it is filtered in chunks of `chunk_size` bytes, so memory use does not
+    depend on the size of the file.
+
     Args:
         source (str): Path to the source file.
         destination (str): Path to the destination file.
         strip_empty (bool, optional): Whether to strip empty lines. Defaults to True.
+        chunk_size (int, optional): The number of bytes read at a time when stripping empty lines. Defaults to 1 MiB.
 
     Raises:
         TypeError: If `source` or `destination` is not a string.
@@ -540,35 +670,192 @@ def copy_csv(source, destination, strip_empty=True):
             f"Invalid type for source or destination: {type(source)}, {type(destination)}"
         )
     try:
-        with open(destination, "w") as f:
-            if strip_empty:
-                f.writelines(
-                    [line for line in open(source, "r").readlines() if line.strip() != ""]
-                )
-            else:
-                f.writelines([line for line in open(source, "r").readlines()])
+        if not strip_empty:
+            shutil.copyfile(source, destination)
+            return None
+        with open(source, "rb") as src, open(destination, "wb") as dst:
+            rest = b""
+            while True:
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    break
+                lines = (rest + chunk).split(b"\n")
+                rest = lines.pop()
+                dst.write(b"".join(line + b"\n" for line in lines if line.strip() != b""))
+            if rest.strip() != b"":
+                dst.write(rest)
     except FileNotFoundError:
         Shout.error(f"Issue reading file(s): {source}, {destination}\nMake sure they exist.")
         return None
 
 
-def read_csv(file):
+def _cache_stamp(file):
+    """
+    Returns what identifies a version of a file for its cache: size, modification time and
+    a hash of its first and last 64 KiB.
+
+    Args:
+        file (str): The file.
+
+    Returns:
+        dict: The `size`, `mtime` (in nanoseconds) and `hash` of the file.
+    """
+    stat = os.stat(file)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file, "rb") as f:
+        digest.update(f.read(1 << 16))
+        f.seek(max(0, stat.st_size - (1 << 16)))
+        digest.update(f.read(1 << 16))
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns, "hash": digest.hexdigest()}
+
+
+def _new_manifest(file, headers):
+    """
+    Starts an empty cache manifest for a file.
+
+    Args:
+        file (str): The csv file.
+        headers (list): The headers of the file.
+
+    Returns:
+        dict: The manifest.
+    """
+    return {"stamp": _cache_stamp(file), "headers": list(headers), "typed": {}}
+
+
+def _load_manifest(file):
+    """
+    Loads the cache manifest of a file, if it is up to date.
+
+    Args:
+        file (str): The csv file.
+
+    Returns:
+        dict: The manifest (or None if there is no valid cache).
+    """
+    path = os.path.join(file + ".cache", "manifest.json")
+    try:
+        with open(path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("stamp") != _cache_stamp(file):
+        return None
+    return manifest
+
+
+def _save_manifest(file, manifest):
+    """
+    Saves the cache manifest of a file (atomically).
+
+    Args:
+        file (str): The csv file.
+        manifest (dict): The manifest.
+
+    Returns:
+        None
+    """
+    directory = file + ".cache"
+    handle, temp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(handle, "w") as f:
+        json.dump(manifest, f)
+    os.replace(temp, os.path.join(directory, "manifest.json"))
+
+
+def _save_array(path, array):
+    """
+    Saves an array as a `.npy` file (atomically, so concurrent readers never see a partial
+    file).
+
+    Args:
+        path (str): The `.npy` file.
+        array (numpy.ndarray): The array.
+
+    Returns:
+        None
+    """
+    handle, temp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as f:
+            numpy.save(f, array)
+        os.replace(temp, path)
+    except BaseException:
+        os.remove(temp)
+        raise
+
+
+def _save_column(file, column, name):
+    """
+    Saves a column to the cache of a file as `.npy` files (strings are stored as UTF-8
+    bytes plus offsets, so every file can be memory-mapped).
+
+    Args:
+        file (str): The csv file.
+        column (numpy.ndarray): The column.
+        name (str): The base name of the column's files.
+
+    Returns:
+        dict: The manifest entry of the column.
+    """
+    directory = file + ".cache"
+    os.makedirs(directory, exist_ok=True)
+    if column.dtype != object:
+        _save_array(os.path.join(directory, name + ".npy"), column)
+        return {"name": name, "dtype": column.dtype.str}
+    encoded = [value.encode("utf-8") for value in column]
+    offsets = numpy.zeros(len(encoded) + 1, dtype=numpy.int64)
+    numpy.cumsum([len(value) for value in encoded], out=offsets[1:])
+    _save_array(
+        os.path.join(directory, name + ".data.npy"),
+        numpy.frombuffer(b"".join(encoded), dtype=numpy.uint8),
+    )
+    _save_array(os.path.join(directory, name + ".offsets.npy"), offsets)
+    return {"name": name, "dtype": "str"}
+
+
+def _load_column(file, entry):
+    """
+    Loads a column from the cache of a file (numeric columns are memory-mapped; string
+    columns are decoded into a new object array).
+
+    Args:
+        file (str): The csv file.
+        entry (dict): The manifest entry of the column.
+
+    Returns:
+        numpy.ndarray: The column.
     """
-    Read a csv file.
+    path = os.path.join(file + ".cache", entry["name"])
+    if entry["dtype"] != "str":
+        return numpy.load(path + ".npy", mmap_mode="r")
+    data = numpy.load(path + ".data.npy", mmap_mode="r")
+    offsets = numpy.load(path + ".offsets.npy").tolist()
+    text = data.tobytes()
+    column = numpy.empty(len(offsets) - 1, dtype=object)
+    column[:] = [text[start:stop].decode("utf-8") for start, stop in zip(offsets, offsets[1:])]
+    return column
+
+
+def read_csv(file, lazy=False):
+    """
+    Read a csv file (gzip, bz2 and xz files are decompressed transparently).
 
     Args:
         file (str): The csv file to read from.
+        lazy (bool, optional): Whether to stream the rows (see `iter_csv`) instead of reading them all. Defaults to False.
 
     Raises:
         TypeError: If `file` is not a string.
 
     Returns:
-        list: A list of rows as dictionaries.
+        list: A list of rows as dictionaries (or a generator of them if `lazy` is set).
     """
     if type(file) != str:
         raise TypeError(f"Invalid type for file: {type(file)}")
+    if lazy:
+        return iter_csv(file)
     try:
-        with open(file, "r") as f:
+        with _open(file, "r") as f:
             data = csv.DictReader(f)
             return [row for row in data]
     except FileNotFoundError:
@@ -576,23 +863,368 @@ def read_csv(file):
         return None
 
 
-def write_csv(file, data, headers=None):
+def iter_csv(file, chunk_size=None):
+    """
+    Stream the rows of a csv file, one at a time or in chunks (gzip, bz2 and xz files are
+    decompressed as they are read).
+
+    Args:
+        file (str): The csv file to read from.
+        chunk_size (int, optional): The number of rows per chunk. Defaults to None (yield single rows).
+
+    Raises:
+        TypeError: If `file` is not a string.
+        ValueError: If `chunk_size` is not a positive integer.
+
+    Yields:
+        dict or list: The rows as dictionaries (or lists of up to `chunk_size` of them).
+    """
+    if type(file) != str:
+        raise TypeError(f"Invalid type for file: {type(file)}")
+    if chunk_size is not None and (type(chunk_size) != int or chunk_size < 1):
+        raise ValueError(f"Invalid chunk size: {chunk_size}")
+    return _iter_csv(file, chunk_size)
+
+
+def _iter_csv(file, chunk_size):
+    """
+    Generator behind `iter_csv` (kept separate so argument errors are raised on call).
+
+    Args:
+        file (str): The csv file to read from.
+        chunk_size (int): The number of rows per chunk (or None).
+
+    Yields:
+        dict or list: The rows as dictionaries (or lists of them).
+    """
+    try:
+        with _open(file, "r") as f:
+            data = csv.DictReader(f)
+            if chunk_size is None:
+                yield from data
+                return
+            chunk = []
+            for row in data:
+                chunk.append(row)
+                if len(chunk) == chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+    except FileNotFoundError:
+        Shout.error(f"Issue reading file: {file}\nMake sure it exists.")
+        return
+
+
+def _infer_dtype(values):
+    """
+    Infers the NumPy type of a column from a sample of its values.
+
+    Args:
+        values (list): The sample values (strings).
+
+    Returns:
+        type: `numpy.bool_`, `numpy.int64`, `numpy.float64` or `object` (strings).
+    """
+    filled = [value.strip() for value in values if value.strip() != ""]
+    if not filled:
+        return object
+    if all(value.lower() in ("true", "false") for value in filled):
+        return numpy.bool_ if len(filled) == len(values) else object
+    try:
+        for value in filled:
+            # Integers outside int64 fall through to float64.
+            if not -(1 << 63) <= int(value) < 1 << 63:
+                raise ValueError(value)
+        return numpy.int64 if len(filled) == len(values) else numpy.float64
+    except ValueError:
+        pass
+    try:
+        for value in filled:
+            float(value)
+        return numpy.float64
+    except ValueError:
+        return object
+
+
+def _types_entry(key, dtypes, sample_size):
+    """
+    Describes how the type of a column is chosen, so cached columns are only reused for
+    reads that would choose it the same way.
+
+    Args:
+        key (str): The column key.
+        dtypes (dict): Types overriding the inferred ones, by column.
+        sample_size (int): The number of rows used to infer types.
+
+    Returns:
+        dict: The overriding type, or the sample size the type is inferred from.
+    """
+    if key in dtypes:
+        dtype = _column_type(dtypes[key])
+        return {"override": "str" if dtype is object else numpy.dtype(dtype).str}
+    return {"sample_size": sample_size}
+
+
+def _widen_dtype(dtype, value):
+    """
+    Picks the type a column widens to when a value does not fit its inferred type.
+
+    Args:
+        dtype (type): The inferred NumPy type.
+        value (str): The value that does not fit.
+
+    Returns:
+        type: `numpy.float64` for an integer column and an empty or numeric value,
+            otherwise `object` (strings).
+    """
+    if numpy.issubdtype(dtype, numpy.integer):
+        try:
+            if value.strip() == "" or float(value) is not None:
+                return numpy.float64
+        except ValueError:
+            pass
+    return object
+
+
+def _column_type(dtype):
+    """
+    Normalizes a requested column type.
+
+    Args:
+        dtype (type): The requested type.
+
+    Returns:
+        type: The type, or `object` for string types (NumPy string arrays have a fixed width).
+    """
+    if dtype is object or numpy.dtype(dtype).kind in "SU":
+        return object
+    return dtype
+
+
+def _parse_value(value, dtype):
+    """
+    Parses a csv value into a NumPy type.
+
+    Args:
+        value (str): The value.
+        dtype (type): The NumPy type.
+
+    Raises:
+        ValueError: If the value cannot be parsed.
+
+    Returns:
+        object: The parsed value.
+    """
+    if dtype is object:
+        return value
+    if dtype is numpy.bool_:
+        lowered = value.strip().lower()
+        if lowered not in ("true", "false"):
+            raise ValueError(f"Invalid boolean: {value!r}")
+        return lowered == "true"
+    if numpy.issubdtype(dtype, numpy.floating) and value.strip() == "":
+        return numpy.nan
+    return dtype(value)
+
+
+def read_csv_columns(
+    file, keys=None, dtypes=None, sample_size=1000, chunk_size=65536, cache=False
+):
+    """
+    Read columns of a csv file into typed NumPy arrays.
+
+    Each column's type (bool, int, float or string) is inferred from the first
+    `sample_size` rows unless given in `dtypes`; strings are stored in object arrays. If a
+    later value does not fit an inferred type, the column is widened: integers become
+    floats (for empty or fractional values), and any other mismatch makes the column
+    strings, which reads the file again.
+    Values are parsed straight into fixed-size buffers of `chunk_size` rows.
+
+    Args:
+        file (str): The csv file to read from.
+        keys (list, optional): The column keys or headers to read. Defaults to None (all columns).
+        dtypes (dict, optional): Types overriding the inferred ones, by column (e.g. {"Age": numpy.int32}). Defaults to None.
+        sample_size (int, optional): The number of rows used to infer types. Defaults to 1000.
+        chunk_size (int, optional): The number of rows per buffer. Defaults to 65536.
+        cache (bool, optional): Whether to keep the typed columns as `.npy` files next to the file
+            (`file + ".cache"`) and load them instead of parsing the text while the file is
+            unchanged. Numeric columns are memory-mapped; string columns are still decoded
+            into new object arrays on every load. Defaults to False.
+
+    Raises:
+        TypeError: If `file` is not a string.
+        ValueError: If a value cannot be parsed as the type given for its column in `dtypes`.
+
+    Returns:
+        dict: The columns as NumPy arrays, by key.
+    """
+    if type(file) != str:
+        raise TypeError(f"Invalid type for file: {type(file)}")
+    dtypes = dtypes or {}
+    if cache:
+        try:
+            manifest = _load_manifest(file)
+            if manifest is not None:
+                wanted = manifest["headers"] if keys is None else keys
+                entries = [manifest["typed"].get(key) for key in wanted]
+                if all(
+                    entry is not None
+                    and entry.get("types") == _types_entry(key, dtypes, sample_size)
+                    for key, entry in zip(wanted, entries)
+                ):
+                    return {
+                        key: _load_column(file, entry) for key, entry in zip(wanted, entries)
+                    }
+        except FileNotFoundError:
+            Shout.error(
+                f"Issue reading file: {file}\nMake sure it exists and the keys are correct."
+            )
+            return None
+        columns = read_csv_columns(file, keys, dtypes, sample_size, chunk_size)
+        if columns is not None:
+            with _open(file, "r", newline="") as f:
+                headers = next(csv.reader(f), [])
+            manifest = _load_manifest(file) or _new_manifest(file, headers)
+            for key, column in columns.items():
+                name = f"typed-{manifest['headers'].index(key)}"
+                manifest["typed"][key] = _save_column(file, column, name)
+                manifest["typed"][key]["types"] = _types_entry(key, dtypes, sample_size)
+            _save_manifest(file, manifest)
+        return columns
+    try:
+        text = []
+        while True:
+            columns, widened = _read_columns(file, keys, dtypes, sample_size, chunk_size, text)
+            if widened is None:
+                return columns
+            text.append(widened)
+    except (FileNotFoundError, KeyError):
+        Shout.error(
+            f"Issue reading file: {file}\nMake sure it exists and the keys are correct."
+        )
+        return None
+
+
+def _read_columns(file, keys, dtypes, sample_size, chunk_size, text):
+    """
+    Reads columns of a csv file into typed NumPy arrays (see `read_csv_columns`).
+
+    Args:
+        file (str): The csv file to read from.
+        keys (list): The column keys or headers to read (or None for all columns).
+        dtypes (dict): Types overriding the inferred ones, by column.
+        sample_size (int): The number of rows used to infer types.
+        chunk_size (int): The number of rows per buffer.
+        text (list): Inferred columns already known to hold strings.
+
+    Raises:
+        KeyError: If a key is not a column of the file.
+        ValueError: If a value cannot be parsed as the type given in `dtypes`.
+
+    Returns:
+        tuple: The columns by key and None, or None and the key of an inferred column that
+            turned out to hold strings (the file must then be read again).
+    """
+    with _open(file, "r", newline="") as f:
+        data = csv.reader(f)
+        headers = next(data, [])
+        if keys is None:
+            keys = headers
+        positions = [headers.index(key) if key in headers else None for key in keys]
+        if None in positions:
+            raise KeyError(keys[positions.index(None)])
+
+        # Skip blank lines, like csv.DictReader.
+        data = (row for row in data if row)
+        sample = list(itertools.islice(data, sample_size))
+        types = []
+        for key, position in zip(keys, positions):
+            if key in dtypes:
+                types.append(_column_type(dtypes[key]))
+            elif key in text:
+                types.append(object)
+            else:
+                # Missing trailing fields are read as empty values.
+                types.append(
+                    _infer_dtype(
+                        [row[position] if position < len(row) else "" for row in sample]
+                    )
+                )
+        parsers = [
+            numpy.dtype(dtype).type if dtype is not object else object for dtype in types
+        ]
+
+        chunks = [[] for _ in keys]
+        buffers = [numpy.empty(chunk_size, dtype=dtype) for dtype in types]
+        filled = 0
+        for row in itertools.chain(sample, data):
+            for column, (position, key) in enumerate(zip(positions, keys)):
+                value = row[position] if position < len(row) else ""
+                try:
+                    buffers[column][filled] = _parse_value(value, parsers[column])
+                except (ValueError, OverflowError):
+                    if key in dtypes:
+                        raise ValueError(
+                            f"Invalid value for column '{key}': {value!r} (set its type with `dtypes`)"
+                        ) from None
+                    # An inferred type that no longer fits is widened: integers to
+                    # floats in place, anything else to text by reading again.
+                    dtype = _widen_dtype(types[column], value)
+                    if dtype is object:
+                        return None, key
+                    types[column] = parsers[column] = dtype
+                    chunks[column] = [chunk.astype(dtype) for chunk in chunks[column]]
+                    buffers[column] = buffers[column].astype(dtype)
+                    buffers[column][filled] = _parse_value(value, dtype)
+            filled += 1
+            if filled == chunk_size:
+                for chunk, buffer in zip(chunks, buffers):
+                    chunk.append(buffer.copy())
+                filled = 0
+        for chunk, buffer in zip(chunks, buffers):
+            chunk.append(buffer[:filled].copy())
+
+        return {key: numpy.concatenate(chunk) for key, chunk in zip(keys, chunks)}, None
+
+
+def write_csv(
+    file,
+    data,
+    headers=None,
+    append=False,
+    buffer_size=io.DEFAULT_BUFFER_SIZE,
+    atomic=False,
+    compresslevel=None,
+):
     """
     Write to a csv file.
 
+    Rows are written as they are produced, so `data` can be a generator. Files ending in
+    .gz, .bz2 or .xz are compressed.
+
     Args:
         file (str): The csv file to write to.
-        data (list): The data to write (list of dictionaries).
-        headers (list, optional): The headers for the csv file. Defaults to None.
+        data (iterable): The data to write (an iterable of dictionaries).
+        headers (list, optional): The headers for the csv file. Defaults to None (the keys of the first row).
+        append (bool, optional): Whether to append to the file (the header is only written if the file is new or empty). Defaults to False.
+        buffer_size (int, optional): The size of the write buffer in bytes. Defaults to `io.DEFAULT_BUFFER_SIZE`.
+        atomic (bool, optional): Whether to write to a temporary file and rename it over `file` once done. Defaults to False.
+        compresslevel (int, optional): The compression level for .gz, .bz2 and .xz files. Defaults to the format's default.
 
     Raises:
-        TypeError: If `file` or `data` is not a string or list.
+        TypeError: If `file` is not a string or `data` is not an iterable of rows.
+        ValueError: If `buffer_size` is not an integer greater than 1.
 
     Returns:
         None
     """
-    if type(file) != str or type(data) != list:
+    if type(file) != str or type(data) in (str, dict) or not hasattr(data, "__iter__"):
         raise TypeError(f"Invalid type for file or data: {type(file)}, {type(data)}")
+    # Text files cannot be unbuffered, and a buffering of 1 means line buffering.
+    if type(buffer_size) != int or buffer_size < 2:
+        raise ValueError(f"Invalid buffer size: {buffer_size}")
+    temporary = None
     try:
         if headers:
             for header in headers:
@@ -600,13 +1232,43 @@ def write_csv(file, data, headers=None):
                     raise TypeError(f"Invalid type for header: {type(header)}")
                 if header.lower() == header:
                     Shout.warning(f"Header '{header}' is lowercase. Consider capitalizing it.")
-        with open(file, "w") as f:
-            writer = csv.DictWriter(f, fieldnames=headers)
-            writer.writeheader()
-            writer.writerows(data)
+        rows = iter(data)
+        if headers is None:
+            first = next(rows, None)
+            if first is not None:
+                headers = list(first)
+                rows = itertools.chain([first], rows)
+        new = not append or not os.path.exists(file) or os.path.getsize(file) == 0
+
+        target = file
+        if atomic:
+            temporary = _temporary(file)
+            if not new:
+                shutil.copyfile(file, temporary)
+            target = temporary
+
+        with _open(
+            target,
+            "a" if append else "w",
+            buffering=buffer_size,
+            newline="",
+            compression=_compression(file, "w"),
+            compresslevel=compresslevel,
+        ) as f:
+            writer = csv.DictWriter(f, fieldnames=headers or [])
+            if new:
+                writer.writeheader()
+            writer.writerows(rows)
+
+        if atomic:
+            os.replace(temporary, file)
+            temporary = None
     except FileNotFoundError:
         Shout.error(f"Issue reading file: {file}\nMake sure it exists.")
         return None
+    finally:
+        if temporary is not None and os.path.exists(temporary):
+            os.remove(temporary)
 
 
 def get_csv_row(key, value, file):
@@ -626,7 +1288,7 @@ def get_csv_row(key, value, file):
     if type(value) != str:
         raise TypeError(f"Invalid type for value: {type(value)}")
     try:
-        with open(file, "r") as f:
+        with _open(file, "r") as f:
             data = csv.DictReader(f)
             for row in data:
                 if row[key] == value:
@@ -638,30 +1300,1476 @@ def get_csv_row(key, value, file):
         return None
 
 
-def get_csv_col(key, file):
+def get_csv_rows(key, values, file, unique=False):
     """
-    Get a column from a csv file.
+    Get the rows matching any of several values from a csv file, in a single pass.
 
     Args:
-        key (str): The column key or header.
+        key (str): The key or header of the column to search in.
+        values (iterable): The values to search for.
         file (str): The csv file to read from.
+        unique (bool, optional): Whether each value appears at most once (the search stops once all are found). Defaults to False.
 
     Returns:
-        _type_: _description_
+        list: The matching rows as dictionaries, in file order.
     """
     if type(key) != str:
         raise TypeError(f"Invalid type for key: {type(key)}")
+    if type(values) == str:
+        raise TypeError(f"Invalid type for values: {type(values)}")
+    wanted = set(values)
+    rows = []
+    if not wanted:
+        return rows
+    try:
+        with _open(file, "r") as f:
+            data = csv.DictReader(f)
+            for row in data:
+                if row[key] in wanted:
+                    rows.append(row)
+                    if unique:
+                        wanted.discard(row[key])
+                        if not wanted:
+                            break
+            return rows
+    except (FileNotFoundError, KeyError):
+        Shout.error(f"Issue reading file: {file}\nMake sure it exists and the key is correct.")
+        return None
+
+
+def get_csv_col(key, file):
+    """
+    Get one or more columns from a csv file.
+
+    The column positions are worked out from the header once and the rows are read
+    as plain lists, so no dictionary is built per row.
+
+    Args:
+        key (str or list): The column key or header (or a list of them).
+        file (str): The csv file to read from.
+
+    Returns:
+        list: The column's values (or, if `key` is a list, one list of values per key).
+    """
+    if type(key) == list:
+        for k in key:
+            if type(k) != str:
+                raise TypeError(f"Invalid type for key: {type(k)}")
+    elif type(key) != str:
+        raise TypeError(f"Invalid type for key: {type(key)}")
     if type(file) != str:
         raise TypeError(f"Invalid type for file: {type(file)}")
+    keys = key if type(key) == list else [key]
     try:
-        with open(file, "r") as f:
-            data = csv.DictReader(f)
-            return [row[key] for row in data]
+        with _open(file, "r", newline="") as f:
+            data = csv.reader(f)
+            headers = next(data, None)
+            columns = [[] for _ in keys]
+            if headers is not None:
+                for k in keys:
+                    if k not in headers:
+                        raise KeyError(k)
+                positions = [headers.index(k) for k in keys]
+                for row in data:
+                    if not row:
+                        continue
+                    for column, position in zip(columns, positions):
+                        column.append(row[position] if position < len(row) else None)
+            return columns if type(key) == list else columns[0]
     except (FileNotFoundError, KeyError):
         Shout.error(f"Issue reading file: {file}\nMake sure it exists and the key is correct.")
         return None
 
 
+class CsvRow:
+    """
+    A lazy view of a row of a memory-mapped csv file (see `CsvMap`).
+
+    The row is only decoded and parsed the first time one of its fields is accessed.
+
+    Methods:
+        keys(): Returns the headers.
+        values(): Returns the fields.
+        items(): Returns the `(header, field)` pairs.
+        get(key, default): Gets a field by header, with a default.
+        to_dict(): Returns the row as a dictionary.
+    """
+
+    def __init__(self, data, start, stop, headers, positions):
+        self.data = data
+        self.start = start
+        self.stop = stop
+        self.headers = headers
+        self.positions = positions
+        self.fields = None
+
+    def _parse(self):
+        """
+        Decodes and parses the row (once).
+
+        Returns:
+            list: The fields of the row.
+        """
+        if self.fields is None:
+            self.fields = _parse_record(self.data[self.start : self.stop])
+        return self.fields
+
+    def __getitem__(self, key):
+        if type(key) == int:
+            return self._parse()[key]
+        position = self.positions[key]
+        fields = self._parse()
+        return fields[position] if position < len(fields) else None
+
+    def __len__(self):
+        return len(self.headers)
+
+    def __iter__(self):
+        return iter(self.headers)
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def __eq__(self, other):
+        return self.to_dict() == (other.to_dict() if isinstance(other, CsvRow) else other)
+
+    def __repr__(self):
+        return f"CsvRow({self.to_dict()!r})"
+
+    def keys(self):
+        """
+        Returns the headers.
+
+        Returns:
+            list: The headers.
+        """
+        return list(self.headers)
+
+    def values(self):
+        """
+        Returns the fields.
+
+        Returns:
+            list: The fields, in header order.
+        """
+        return [self[key] for key in self.headers]
+
+    def items(self):
+        """
+        Returns the `(header, field)` pairs.
+
+        Returns:
+            list: The pairs, in header order.
+        """
+        return list(zip(self.headers, self.values()))
+
+    def get(self, key, default=None):
+        """
+        Gets a field by header, with a default.
+
+        Parameters:
+            key (str): The header.
+            default (object): The value returned if there is no such header (optional).
+
+        Returns:
+            str: The field.
+        """
+        return self[key] if key in self.positions else default
+
+    def to_dict(self):
+        """
+        Returns the row as a dictionary.
+
+        Returns:
+            dict: The row.
+        """
+        return dict(self.items())
+
+
+class CsvMap:
+    """
+    A memory-mapped csv file with lazy row views.
+
+    The file is mapped into memory (so several processes share it through the page
+    cache) and a table of row offsets is built once; rows are returned as `CsvRow`
+    views that are only parsed when accessed.
+
+    Parameters:
+        file (str): The csv file to map.
+
+    Methods:
+        close(): Unmaps the file.
+
+    Examples:
+        >>> from commoner import CsvMap
+        >>> with CsvMap("people.csv") as rows:
+        ...     len(rows), rows[0]["Name"], [row["Id"] for row in rows[-2:]]
+        (1000000, "Jane", ["999999", "1000000"])
+    """
+
+    def __init__(self, file):
+        if type(file) != str:
+            raise TypeError(f"Invalid type for file: {type(file)}")
+        _require_uncompressed(file)
+        self.file = file
+        with open(file, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.headers, self.starts, self.stops = self._scan()
+        self.positions = {header: position for position, header in enumerate(self.headers)}
+
+    def _scan(self, block_size=1 << 26):
+        """
+        Builds the table of row offsets.
+
+        Record ends are the newlines at even quote parity; the file is scanned in blocks
+        through a NumPy view of the mapping.
+
+        Parameters:
+            block_size (int): The number of bytes scanned at a time (optional).
+
+        Returns:
+            tuple: The headers and the start and stop offsets of each row (as NumPy arrays).
+        """
+        size = len(self.data)
+        view = numpy.frombuffer(self.data, dtype=numpy.uint8) if size else numpy.empty(0)
+        ends = []
+        quotes = 0
+        for offset in range(0, size, block_size):
+            block = view[offset : offset + block_size]
+            newlines = numpy.flatnonzero(block == ord("\n"))
+            quoted = numpy.flatnonzero(block == ord('"'))
+            parity = (quotes + numpy.searchsorted(quoted, newlines)) % 2
+            ends.append(newlines[parity == 0] + offset + 1)
+            quotes += len(quoted)
+        ends = numpy.concatenate(ends) if ends else numpy.empty(0, dtype=numpy.int64)
+        if size and (len(ends) == 0 or ends[-1] != size):
+            ends = numpy.append(ends, size)
+        ends = ends.astype(numpy.int64)
+        if len(ends) == 0:
+            return [], ends, ends
+
+        headers = _parse_record(self.data[0 : ends[0]])
+        starts = ends[:-1]
+        stops = ends[1:]
+        # Skip blank lines, like csv.DictReader.
+        first = view[starts]
+        blank = (first == ord("\n")) | (
+            (first == ord("\r")) & (stops - starts <= 2) & (stops - starts > 1)
+        )
+        del view
+        return headers, starts[~blank], stops[~blank]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [
+                CsvRow(self.data, int(start), int(stop), self.headers, self.positions)
+                for start, stop in zip(self.starts[index], self.stops[index])
+            ]
+        if index < 0:
+            index += len(self.starts)
+        if not 0 <= index < len(self.starts):
+            raise IndexError("CsvMap index out of range")
+        start = int(self.starts[index])
+        stop = int(self.stops[index])
+        return CsvRow(self.data, start, stop, self.headers, self.positions)
+
+    def __iter__(self):
+        for start, stop in zip(self.starts, self.stops):
+            yield CsvRow(self.data, int(start), int(stop), self.headers, self.positions)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Unmaps the file (rows already returned can no longer be parsed).
+
+        Returns:
+            None
+        """
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+
+def _record_ranges(file, parts):
+    """
+    Splits a csv file into byte ranges that start and end on record boundaries.
+
+    Quote parity is tracked from the start of the file, so newlines inside quoted
+    fields are never taken as boundaries.
+
+    Args:
+        file (str): The csv file.
+        parts (int): The number of ranges to aim for.
+
+    Returns:
+        tuple: The header fields and a list of `(start, stop)` byte ranges.
+    """
+    size = os.path.getsize(file)
+    with open(file, "rb") as f:
+        headers = _parse_record(_read_record(f))
+        position = f.tell()
+        boundaries = [position]
+        targets = [position + (size - position) * part // parts for part in range(1, parts)]
+        target = 0
+        quotes = 0
+        while target < len(targets):
+            block = f.read(1 << 20)
+            if not block:
+                break
+            offset = 0
+            while target < len(targets) and targets[target] < position + len(block):
+                start = max(targets[target] - position, offset)
+                quotes += block.count(b'"', offset, start)
+                offset = start
+                newline = block.find(b"\n", offset)
+                while newline != -1:
+                    quotes += block.count(b'"', offset, newline)
+                    offset = newline + 1
+                    if quotes % 2 == 0:
+                        break
+                    newline = block.find(b"\n", offset)
+                if newline == -1:
+                    break
+                boundary = position + newline + 1
+                if boundary > boundaries[-1]:
+                    boundaries.append(boundary)
+                while target < len(targets) and targets[target] < boundary:
+                    target += 1
+            quotes += block.count(b'"', offset)
+            position += len(block)
+    if size > boundaries[-1]:
+        boundaries.append(size)
+    return headers, list(zip(boundaries, boundaries[1:]))
+
+
+def _parse_range(file, start, stop, headers, positions):
+    """
+    Parses a byte range of a csv file.
+
+    Args:
+        file (str): The csv file.
+        start (int): The offset of the first record.
+        stop (int): The offset after the last record.
+        headers (list): The header fields.
+        positions (list): The positions of the columns to keep (or None for whole rows).
+
+    Returns:
+        list: The rows as dictionaries (or, with `positions`, one list of values per column).
+    """
+    with open(file, "rb") as f:
+        f.seek(start)
+        text = f.read(stop - start).decode("utf-8")
+    if positions is None:
+        return list(csv.DictReader(io.StringIO(text, newline=""), fieldnames=headers))
+    columns = [[] for _ in positions]
+    for row in csv.reader(io.StringIO(text, newline="")):
+        if not row:
+            continue
+        for column, position in zip(columns, positions):
+            column.append(row[position] if position < len(row) else None)
+    return columns
+
+
+def read_csv_parallel(file, keys=None, workers=None):
+    """
+    Read a csv file (or some of its columns) across worker processes.
+
+    The file is split into byte ranges aligned to record boundaries (quoted newlines
+    included), which are parsed in a process pool and joined back in file order.
+
+    Args:
+        file (str): The csv file to read from.
+        keys (str or list, optional): The column key(s) to read (see `get_csv_col`). Defaults to None (whole rows).
+        workers (int, optional): The number of worker processes. Defaults to the number of CPUs.
+
+    Raises:
+        TypeError: If `file` is not a string.
+        ValueError: If `workers` is not a positive integer or the file is compressed.
+
+    Returns:
+        list: The rows as dictionaries, like `read_csv` (or the column(s), like `get_csv_col`).
+    """
+    if type(file) != str:
+        raise TypeError(f"Invalid type for file: {type(file)}")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if type(workers) != int or workers < 1:
+        raise ValueError(f"Invalid number of workers: {workers}")
+    _require_uncompressed(file)
+    try:
+        headers, ranges = _record_ranges(file, workers * 4)
+        positions = None
+        if keys is not None:
+            for key in keys if type(keys) == list else [keys]:
+                if key not in headers:
+                    raise KeyError(key)
+            positions = [
+                headers.index(key) for key in (keys if type(keys) == list else [keys])
+            ]
+
+        if workers == 1 or len(ranges) < 2:
+            parts = [
+                _parse_range(file, start, stop, headers, positions) for start, stop in ranges
+            ]
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                futures = [
+                    pool.submit(_parse_range, file, start, stop, headers, positions)
+                    for start, stop in ranges
+                ]
+                parts = [future.result() for future in futures]
+    except (FileNotFoundError, KeyError):
+        Shout.error(f"Issue reading file: {file}\nMake sure it exists and the key is correct.")
+        return None
+
+    if positions is None:
+        return [row for part in parts for row in part]
+    columns = [
+        [value for part in parts for value in part[number]] for number in range(len(positions))
+    ]
+    return columns if type(keys) == list else columns[0]
+
+
+def _read_record(f):
+    """
+    Reads one csv record (which may span several lines inside quotes) from a binary file.
+
+    Args:
+        f (file): The file, opened in binary mode and positioned at the start of a record.
+
+    Returns:
+        bytes: The raw record (empty at the end of the file).
+    """
+    record = f.readline()
+    while record.count(b'"') % 2 == 1:
+        line = f.readline()
+        if not line:
+            break
+        record += line
+    return record
+
+
+def _parse_record(record):
+    """
+    Parses a raw csv record.
+
+    Args:
+        record (bytes): The raw record.
+
+    Returns:
+        list: The fields of the record.
+    """
+    return next(csv.reader([record.decode("utf-8")]), [])
+
+
+class CsvIndex:
+    """
+    A persistent index from column values to row offsets in a csv file.
+
+    The file is scanned once and the byte offset of the first row holding each value
+    of the indexed columns is recorded, so lookups seek straight to the row. The
+    index is saved to a sidecar file that is rebuilt when the csv file's size or
+    modification time changes.
+
+    Parameters:
+        file (str): The csv file to index.
+        keys (str or list): The column key(s) or header(s) to index.
+        sidecar (str, optional): The sidecar file. Defaults to `file + ".idx"` (None or False disables it).
+
+    Methods:
+        get(key, value): Gets the first row with a value in an indexed column.
+
+    Examples:
+        >>> from commoner import CsvIndex
+        >>> index = CsvIndex("people.csv", ["Id", "Email"])
+        >>> index.get("Id", "42")
+        {"Id": "42", "Email": "jane@example.com", "Name": "Jane"}
+    """
+
+    def __init__(self, file, keys, sidecar=""):
+        if type(file) != str:
+            raise TypeError(f"Invalid type for file: {type(file)}")
+        if type(keys) == str:
+            keys = [keys]
+        _require_uncompressed(file)
+        self.file = file
+        self.keys = list(keys)
+        self.sidecar = file + ".idx" if sidecar == "" else sidecar
+        self.headers = []
+        self.offsets = {}
+        if not self._load():
+            self._build()
+            self._save()
+
+    def _stamp(self):
+        """
+        Returns the size and modification time used to invalidate the sidecar file.
+
+        Returns:
+            dict: The `size` and `mtime` (in nanoseconds) of the csv file.
+        """
+        stat = os.stat(self.file)
+        return {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+    def _load(self):
+        """
+        Loads the index from the sidecar file, if it is up to date.
+
+        Returns:
+            bool: Whether the index was loaded.
+        """
+        if not self.sidecar or not os.path.exists(self.sidecar):
+            return False
+        try:
+            with open(self.sidecar, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("stamp") != self._stamp() or not set(self.keys) <= set(data["offsets"]):
+            return False
+        self.headers = data["headers"]
+        self.offsets = {key: data["offsets"][key] for key in self.keys}
+        return True
+
+    def _save(self):
+        """
+        Saves the index to the sidecar file.
+
+        Returns:
+            None
+        """
+        if not self.sidecar:
+            return
+        with open(self.sidecar, "w") as f:
+            json.dump(
+                {"stamp": self._stamp(), "headers": self.headers, "offsets": self.offsets}, f
+            )
+
+    def _build(self):
+        """
+        Scans the csv file and records the offsets of the indexed columns.
+
+        Raises:
+            KeyError: If a key is not a column of the file.
+
+        Returns:
+            None
+        """
+        with open(self.file, "rb") as f:
+            self.headers = _parse_record(_read_record(f))
+            for key in self.keys:
+                if key not in self.headers:
+                    raise KeyError(key)
+            positions = [(key, self.headers.index(key)) for key in self.keys]
+            self.offsets = {key: {} for key in self.keys}
+            while True:
+                offset = f.tell()
+                record = _read_record(f)
+                if not record:
+                    break
+                if record.strip() == b"":
+                    continue
+                row = _parse_record(record)
+                for key, position in positions:
+                    if position < len(row):
+                        self.offsets[key].setdefault(row[position], offset)
+
+    def get(self, key, value):
+        """
+        Gets the first row with a value in an indexed column.
+
+        Parameters:
+            key (str): The indexed column key or header.
+            value (str): The value to search for.
+
+        Raises:
+            KeyError: If `key` is not indexed.
+
+        Returns:
+            dict: The row as a dictionary (or None if no row has the value).
+        """
+        offset = self.offsets[key].get(value)
+        if offset is None:
+            return None
+        with open(self.file, "rb") as f:
+            f.seek(offset)
+            return dict(zip(self.headers, _parse_record(_read_record(f))))
+
+
+class CsvQuery:
+    """
+    A streaming filter, projection and aggregation query over a csv file.
+
+    The file is read in a single pass as plain lists: predicates and projection are
+    applied before any dictionary is built, and only the group-by state grows with
+    the input.
+
+    Parameters:
+        file (str): The csv file to query.
+
+    Methods:
+        where(key, op, value): Keeps the rows whose column matches a condition.
+        select(keys): Keeps only some columns.
+        group_by(keys): Groups the rows for `agg`.
+        agg(**aggregations): Runs the query and aggregates each group.
+        rows(): Runs the query and yields the matching rows.
+        count(): Runs the query and counts the matching rows.
+
+    Examples:
+        >>> from commoner import query
+        >>> query("sales.csv").where("Year", ">=", 2020).group_by("Region").agg(
+        ...     total=("Amount", "sum"), orders=("Id", "count")
+        ... )
+        [{"Region": "EU", "total": 1520.0, "orders": 12}, {"Region": "US", "total": 980.5, "orders": 7}]
+    """
+
+    OPERATORS = {
+        "==": lambda field, value: field == value,
+        "!=": lambda field, value: field != value,
+        "<": lambda field, value: field < value,
+        "<=": lambda field, value: field <= value,
+        ">": lambda field, value: field > value,
+        ">=": lambda field, value: field >= value,
+        "in": lambda field, value: field in value,
+        "not in": lambda field, value: field not in value,
+        "contains": lambda field, value: value in field,
+        "startswith": lambda field, value: field.startswith(value),
+    }
+
+    AGGREGATES = ["count", "sum", "mean", "min", "max"]
+
+    def __init__(self, file):
+        if type(file) != str:
+            raise TypeError(f"Invalid type for file: {type(file)}")
+        self.file = file
+        self.conditions = []
+        self.keys = None
+        self.groups = []
+
+    def where(self, key, op, value):
+        """
+        Keeps the rows whose column matches a condition (conditions are combined with AND).
+
+        Numeric values (int or float) compare the column as a number; rows where it is
+        empty or not a number are dropped.
+
+        Parameters:
+            key (str): The column key or header.
+            op (str): One of "==", "!=", "<", "<=", ">", ">=", "in", "not in", "contains" or "startswith".
+            value (object): The value to compare with.
+
+        Raises:
+            ValueError: If `op` is not supported.
+
+        Returns:
+            CsvQuery: The query.
+        """
+        if op not in CsvQuery.OPERATORS:
+            raise ValueError(f"Invalid operator: {op}")
+        self.conditions.append((key, CsvQuery.OPERATORS[op], value))
+        return self
+
+    def select(self, keys):
+        """
+        Keeps only some columns.
+
+        Parameters:
+            keys (str or list): The column key(s) or header(s).
+
+        Returns:
+            CsvQuery: The query.
+        """
+        self.keys = [keys] if type(keys) == str else list(keys)
+        return self
+
+    def group_by(self, keys):
+        """
+        Groups the rows for `agg`.
+
+        Parameters:
+            keys (str or list): The column key(s) or header(s) to group by.
+
+        Returns:
+            CsvQuery: The query.
+        """
+        self.groups = [keys] if type(keys) == str else list(keys)
+        return self
+
+    def _scan(self, keys):
+        """
+        Streams the rows matching the conditions, projected to some columns.
+
+        Parameters:
+            keys (list): The column keys to keep.
+
+        Raises:
+            KeyError: If a column does not exist.
+
+        Yields:
+            list: The values of `keys` for each matching row.
+        """
+        with _open(self.file, "r", newline="") as f:
+            data = csv.reader(f)
+            headers = next(data, None)
+            if headers is None:
+                return
+            for key in [condition[0] for condition in self.conditions] + keys:
+                if key not in headers:
+                    raise KeyError(key)
+            conditions = [
+                (headers.index(key), op, value, type(value) in (int, float))
+                for key, op, value in self.conditions
+            ]
+            positions = [headers.index(key) for key in keys]
+            width = len(headers)
+            for row in data:
+                if not row:
+                    continue
+                if len(row) < width:
+                    row += [None] * (width - len(row))
+                for position, op, value, numeric in conditions:
+                    field = row[position]
+                    if numeric:
+                        try:
+                            field = float(field)
+                        except (TypeError, ValueError):
+                            break
+                    elif field is None:
+                        break
+                    if not op(field, value):
+                        break
+                else:
+                    yield [row[position] for position in positions]
+
+    def rows(self):
+        """
+        Runs the query and yields the matching rows.
+
+        Yields:
+            dict: The matching rows (with the selected columns only, if any).
+        """
+        try:
+            keys = self.keys
+            if keys is None:
+                with _open(self.file, "r", newline="") as f:
+                    keys = next(csv.reader(f), [])
+            for values in self._scan(keys):
+                yield dict(zip(keys, values))
+        except (FileNotFoundError, KeyError):
+            Shout.error(
+                f"Issue reading file: {self.file}\nMake sure it exists and the keys are correct."
+            )
+            return
+
+    def __iter__(self):
+        return self.rows()
+
+    def count(self):
+        """
+        Runs the query and counts the matching rows.
+
+        Returns:
+            int: The number of matching rows.
+        """
+        try:
+            return sum(1 for _ in self._scan([]))
+        except (FileNotFoundError, KeyError):
+            Shout.error(
+                f"Issue reading file: {self.file}\nMake sure it exists and the keys are correct."
+            )
+            return None
+
+    def agg(self, **aggregations):
+        """
+        Runs the query and aggregates each group (or all matching rows, without `group_by`).
+
+        Parameters:
+            **aggregations (tuple): `name=(key, aggregate)` pairs, where `aggregate` is one of
+                "count", "sum", "mean", "min" or "max" ("count" counts non-empty values; the
+                others treat the column as numbers and skip empty values).
+
+        Raises:
+            ValueError: If an aggregate is not supported.
+
+        Returns:
+            list: One dictionary per group, with the group-by columns and the aggregations.
+        """
+        for name, (key, aggregate) in aggregations.items():
+            if aggregate not in CsvQuery.AGGREGATES:
+                raise ValueError(f"Invalid aggregate for {name}: {aggregate}")
+        specs = list(aggregations.items())
+        keys = self.groups + [key for _, (key, _) in specs]
+        size = len(self.groups)
+        states = {}
+        try:
+            for values in self._scan(keys):
+                group = tuple(values[:size])
+                state = states.get(group)
+                if state is None:
+                    # Count of values, count of numbers, sum, minimum and maximum.
+                    state = states[group] = [[0, 0, 0.0, None, None] for _ in specs]
+                for accumulator, value in zip(state, values[size:]):
+                    if value is None or value == "":
+                        continue
+                    accumulator[0] += 1
+                    try:
+                        number = float(value)
+                    except ValueError:
+                        continue
+                    accumulator[1] += 1
+                    accumulator[2] += number
+                    if accumulator[3] is None or number < accumulator[3]:
+                        accumulator[3] = number
+                    if accumulator[4] is None or number > accumulator[4]:
+                        accumulator[4] = number
+        except (FileNotFoundError, KeyError):
+            Shout.error(
+                f"Issue reading file: {self.file}\nMake sure it exists and the keys are correct."
+            )
+            return None
+
+        results = []
+        for group, state in states.items():
+            result = dict(zip(self.groups, group))
+            for (name, (_, aggregate)), accumulator in zip(specs, state):
+                count, numbers, total, low, high = accumulator
+                if aggregate == "count":
+                    result[name] = count
+                elif aggregate == "sum":
+                    result[name] = total
+                elif aggregate == "mean":
+                    result[name] = total / numbers if numbers else None
+                elif aggregate == "min":
+                    result[name] = low
+                else:
+                    result[name] = high
+            results.append(result)
+        return results
+
+
+def query(file):
+    """
+    Start a streaming query over a csv file (see `CsvQuery`).
+
+    Args:
+        file (str): The csv file to query.
+
+    Raises:
+        TypeError: If `file` is not a string.
+
+    Returns:
+        CsvQuery: The query.
+    """
+    return CsvQuery(file)
+
+
+def _sort_key(value, numeric, reverse=False):
+    """
+    Calculates the sort key of a field.
+
+    Args:
+        value (str): The field.
+        numeric (bool): Whether to sort numerically (empty, NaN or non-numeric fields sort last).
+        reverse (bool, optional): Whether the sort is descending (so the fields that sort last
+            get the lowest key). Defaults to False.
+
+    Returns:
+        object: The sort key.
+    """
+    if not numeric:
+        return value
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        number = None
+    if number is None or number != number:
+        return (-1 if reverse else 1, 0.0)
+    return (0, number)
+
+
+def _sort_run(rows, position, numeric, reverse, path):
+    """
+    Sorts a run of rows and spills it to a temporary file.
+
+    Args:
+        rows (list): The rows (lists of fields).
+        position (int): The position of the sort column.
+        numeric (bool): Whether to sort numerically.
+        reverse (bool): Whether to sort in descending order.
+        path (str): The file to write the sorted run to.
+
+    Returns:
+        str: The path of the run.
+    """
+    rows.sort(
+        key=lambda row: _sort_key(
+            row[position] if position < len(row) else "", numeric, reverse
+        ),
+        reverse=reverse,
+    )
+    with open(path, "w", newline="") as f:
+        csv.writer(f).writerows(rows)
+    return path
+
+
+def _read_run(path):
+    """
+    Streams the rows of a sorted run.
+
+    Args:
+        path (str): The run file.
+
+    Yields:
+        list: The rows.
+    """
+    with open(path, "r", newline="") as f:
+        yield from csv.reader(f)
+
+
+def sort_csv(
+    source, destination, key, numeric=False, reverse=False, run_size=1 << 20, workers=1
+):
+    """
+    Sort a csv file by a column, using bounded memory (external merge sort).
+
+    The file is read in runs of `run_size` rows; each run is sorted and spilled to a
+    temporary file, and the runs are then merged with `heapq.merge`. The sort is stable.
+
+    Args:
+        source (str): Path to the source file.
+        destination (str): Path to the destination file.
+        key (str): The column key or header to sort by.
+        numeric (bool, optional): Whether to sort numerically (empty, NaN or non-numeric values sort last, in either order). Defaults to False.
+        reverse (bool, optional): Whether to sort in descending order. Defaults to False.
+        run_size (int, optional): The number of rows held in memory per run (up to `workers + 1` runs are held at once). Defaults to 1048576.
+        workers (int, optional): The number of worker processes sorting runs (1 sorts in the current process). Defaults to 1.
+
+    Raises:
+        TypeError: If `source`, `destination` or `key` is not a string.
+        ValueError: If `run_size` or `workers` is not a positive integer.
+
+    Returns:
+        None
+    """
+    if type(source) != str or type(destination) != str:
+        raise TypeError(
+            f"Invalid type for source or destination: {type(source)}, {type(destination)}"
+        )
+    if type(key) != str:
+        raise TypeError(f"Invalid type for key: {type(key)}")
+    if type(run_size) != int or run_size < 1:
+        raise ValueError(f"Invalid run size: {run_size}")
+    if type(workers) != int or workers < 1:
+        raise ValueError(f"Invalid number of workers: {workers}")
+    directory = tempfile.mkdtemp(prefix="commoner-")
+    pool = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        with _open(source, "r", newline="") as f:
+            data = csv.reader(f)
+            headers = next(data, None)
+            if headers is None:
+                shutil.copyfile(source, destination)
+                return None
+            if key not in headers:
+                raise KeyError(key)
+            position = headers.index(key)
+
+            runs = []
+            pending = []
+            while True:
+                chunk = list(itertools.islice(data, run_size))
+                if not chunk:
+                    break
+                rows = [row for row in chunk if row]
+                if not rows:
+                    continue
+                path = os.path.join(directory, f"{len(runs) + len(pending)}.csv")
+                if pool is None:
+                    runs.append(_sort_run(rows, position, numeric, reverse, path))
+                    continue
+                # Keep at most `workers` runs in flight so memory stays bounded.
+                if len(pending) >= workers:
+                    runs.append(pending.pop(0).result())
+                pending.append(pool.submit(_sort_run, rows, position, numeric, reverse, path))
+            runs += [run.result() for run in pending]
+
+        with _open(destination, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            writer.writerows(
+                heapq.merge(
+                    *[_read_run(path) for path in runs],
+                    key=lambda row: _sort_key(
+                        row[position] if position < len(row) else "", numeric, reverse
+                    ),
+                    reverse=reverse,
+                )
+            )
+    except (FileNotFoundError, KeyError):
+        Shout.error(
+            f"Issue reading file: {source}\nMake sure it exists and the key is correct."
+        )
+        return None
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _side_rows(file, on, keep):
+    """
+    Streams the rows of one side of a join as `(key, values)` pairs.
+
+    Args:
+        file (str): The csv file.
+        on (list): The positions of the join columns.
+        keep (list): The positions of the other columns to keep.
+
+    Yields:
+        tuple: The join key (a tuple) and the kept values (a list).
+    """
+    with _open(file, "r", newline="") as f:
+        data = csv.reader(f)
+        next(data, None)
+        for row in data:
+            if not row:
+                continue
+            yield (
+                tuple(row[position] if position < len(row) else None for position in on),
+                [row[position] if position < len(row) else None for position in keep],
+            )
+
+
+def _hash_join(build, probe, preserve_build, preserve_probe):
+    """
+    Joins two streams of `(key, values)` pairs, holding only the build side in memory.
+
+    Args:
+        build (iterable): The build side.
+        probe (iterable): The probe side.
+        preserve_build (bool): Whether to keep unmatched build rows.
+        preserve_probe (bool): Whether to keep unmatched probe rows.
+
+    Yields:
+        tuple: `(key, build_values, probe_values)`, with None for a missing side.
+    """
+    table = {}
+    for key, values in build:
+        table.setdefault(key, []).append([values, False])
+    for key, values in probe:
+        entries = table.get(key)
+        if entries:
+            for entry in entries:
+                entry[1] = True
+                yield key, entry[0], values
+        elif preserve_probe:
+            yield key, None, values
+    if preserve_build:
+        for key, entries in table.items():
+            for values, matched in entries:
+                if not matched:
+                    yield key, values, None
+
+
+def _partition_side(rows, directory, name, partitions):
+    """
+    Spills one side of a join to partition files by join key.
+
+    Fields are written with a "v" prefix and missing (None) fields as empty strings, so
+    they read back exactly (see `_partition_rows`).
+
+    Args:
+        rows (iterable): The `(key, values)` pairs.
+        directory (str): The directory for the partition files.
+        name (str): The prefix of the partition files.
+        partitions (int): The number of partitions.
+
+    Returns:
+        list: The paths of the partition files.
+    """
+    paths = [os.path.join(directory, f"{name}-{number}.csv") for number in range(partitions)]
+    handles = [open(path, "w", newline="") for path in paths]
+    try:
+        writers = [csv.writer(handle) for handle in handles]
+        for key, values in rows:
+            writers[hash(key) % partitions].writerow(
+                ["" if value is None else "v" + value for value in list(key) + values]
+            )
+    finally:
+        for handle in handles:
+            handle.close()
+    return paths
+
+
+def _partition_rows(path, size):
+    """
+    Streams the `(key, values)` pairs of a partition file.
+
+    Args:
+        path (str): The partition file.
+        size (int): The number of join columns.
+
+    Yields:
+        tuple: The join key (a tuple) and the values (a list).
+    """
+    with open(path, "r", newline="") as f:
+        for row in csv.reader(f):
+            row = [value[1:] if value else None for value in row]
+            yield tuple(row[:size]), row[size:]
+
+
+def join_csv(left, right, on, how="inner", keys=None, max_rows=1 << 20, partitions=64):
+    """
+    Join two csv files on one or more columns (hash join).
+
+    A hash table is built from the smaller file, projected to the needed columns, and
+    the larger file is streamed through it. If the build side has more than `max_rows`
+    rows, both files are instead partitioned by join key into temporary files and each
+    pair of partitions is joined in memory (Grace hash join), in which case the output
+    is not in file order.
+
+    Columns of `right` whose names also appear in `left` are suffixed with "_right".
+
+    Args:
+        left (str): The left csv file.
+        right (str): The right csv file.
+        on (str or list): The join column key(s), present in both files.
+        how (str, optional): "inner", "left", "right" or "outer". Defaults to "inner".
+        keys (list, optional): The output columns to keep. Defaults to None (all).
+        max_rows (int, optional): The largest number of build rows held in memory. Defaults to 1048576.
+        partitions (int, optional): The number of partitions when falling back to a Grace hash join. Defaults to 64.
+
+    Raises:
+        TypeError: If `left` or `right` is not a string.
+        ValueError: If `how` is not supported.
+
+    Yields:
+        dict: The joined rows (missing values are None).
+    """
+    if type(left) != str or type(right) != str:
+        raise TypeError(f"Invalid type for left or right: {type(left)}, {type(right)}")
+    if how not in ("inner", "left", "right", "outer"):
+        raise ValueError(f"Invalid join type: {how}")
+    return _join_csv(
+        left, right, [on] if type(on) == str else list(on), how, keys, max_rows, partitions
+    )
+
+
+def _join_csv(left, right, on, how, keys, max_rows, partitions):
+    """
+    Generator behind `join_csv` (kept separate so argument errors are raised on call).
+
+    Args:
+        left (str): The left csv file.
+        right (str): The right csv file.
+        on (list): The join column keys.
+        how (str): The join type.
+        keys (list): The output columns to keep (or None).
+        max_rows (int): The largest number of build rows held in memory.
+        partitions (int): The number of partitions for a Grace hash join.
+
+    Yields:
+        dict: The joined rows.
+    """
+    directory = None
+    try:
+        sides = []
+        for file in (left, right):
+            with _open(file, "r", newline="") as f:
+                headers = next(csv.reader(f), [])
+            for key in on:
+                if key not in headers:
+                    raise KeyError(key)
+            sides.append(headers)
+        left_pairs = [
+            (header, position) for position, header in enumerate(sides[0]) if header not in on
+        ]
+        right_pairs = [
+            (header + "_right" if header in sides[0] else header, position)
+            for position, header in enumerate(sides[1])
+            if header not in on
+        ]
+        on_names = on
+        if keys is not None:
+            names = on + [name for name, _ in left_pairs + right_pairs]
+            for key in keys:
+                if key not in names:
+                    raise KeyError(key)
+            on_names = [key for key in on if key in keys]
+            left_pairs = [pair for pair in left_pairs if pair[0] in keys]
+            right_pairs = [pair for pair in right_pairs if pair[0] in keys]
+        left_names = [name for name, _ in left_pairs]
+        right_names = [name for name, _ in right_pairs]
+        left_side = (
+            left,
+            [sides[0].index(key) for key in on],
+            [position for _, position in left_pairs],
+        )
+        right_side = (
+            right,
+            [sides[1].index(key) for key in on],
+            [position for _, position in right_pairs],
+        )
+
+        swap = os.path.getsize(left) < os.path.getsize(right)
+        build, probe = (left_side, right_side) if swap else (right_side, left_side)
+        preserve_left = how in ("left", "outer")
+        preserve_right = how in ("right", "outer")
+        preserve_build, preserve_probe = (
+            (preserve_left, preserve_right) if swap else (preserve_right, preserve_left)
+        )
+
+        build_count = sum(1 for _ in itertools.islice(_side_rows(*build), max_rows + 1))
+        if build_count <= max_rows:
+            pairs = [(_side_rows(*build), _side_rows(*probe))]
+        else:
+            directory = tempfile.mkdtemp(prefix="commoner-")
+            build_paths = _partition_side(_side_rows(*build), directory, "build", partitions)
+            probe_paths = _partition_side(_side_rows(*probe), directory, "probe", partitions)
+            pairs = [
+                (_partition_rows(build_path, len(on)), _partition_rows(probe_path, len(on)))
+                for build_path, probe_path in zip(build_paths, probe_paths)
+            ]
+
+        for build_rows, probe_rows in pairs:
+            for key, build_values, probe_values in _hash_join(
+                build_rows, probe_rows, preserve_build, preserve_probe
+            ):
+                left_values, right_values = (
+                    (build_values, probe_values) if swap else (probe_values, build_values)
+                )
+                row = {name: value for name, value in zip(on, key) if name in on_names}
+                row.update(zip(left_names, left_values or [None] * len(left_names)))
+                row.update(zip(right_names, right_values or [None] * len(right_names)))
+                yield row
+    except (FileNotFoundError, KeyError):
+        Shout.error(
+            f"Issue reading file(s): {left}, {right}\nMake sure they exist and the keys are correct."
+        )
+        return
+    finally:
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+class _BloomFilter:
+    """
+    A Bloom filter over strings (approximate set membership in a fixed number of bits).
+
+    Parameters:
+        capacity (int): The expected number of distinct items.
+        error_rate (float): The acceptable false positive rate.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * log(error_rate) / log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def add(self, item):
+        """
+        Adds an item.
+
+        Parameters:
+            item (str): The item.
+
+        Returns:
+            bool: Whether the item was (probably) already present.
+        """
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        present = True
+        for number in range(self.hashes):
+            bit = (first + number * second) % self.size
+            if not self.bits[bit >> 3] & (1 << (bit & 7)):
+                present = False
+                self.bits[bit >> 3] |= 1 << (bit & 7)
+        return present
+
+
+def dedup_csv(
+    source,
+    destination,
+    key,
+    max_keys=1 << 20,
+    partitions=64,
+    bloom=False,
+    capacity=None,
+    error_rate=0.001,
+):
+    """
+    Remove rows with duplicate keys from a csv file (the first occurrence is kept), using bounded memory.
+
+    Keys are tracked in a set until `max_keys` distinct keys have been seen; the seen keys
+    and the remaining rows are then spilled to `partitions` temporary files by key hash,
+    deduplicated one partition at a time and merged back in file order. With `bloom`,
+    a fixed-size Bloom filter is used instead: memory stays small, but about
+    `error_rate` of the unique rows are wrongly dropped.
+
+    The result is written to a temporary file that replaces `destination` once complete,
+    so `destination` is left untouched on error and may be `source` itself.
+
+    Args:
+        source (str): Path to the source file.
+        destination (str): Path to the destination file.
+        key (str or list): The column key(s) or header(s) identifying a row.
+        max_keys (int, optional): The largest number of keys held in memory. Defaults to 1048576.
+        partitions (int, optional): The number of temporary partition files. Defaults to 64.
+        bloom (bool, optional): Whether to use an approximate Bloom filter. Defaults to False.
+        capacity (int, optional): The expected number of distinct keys (for `bloom`; the filter takes about 1.8 bytes per key at the default `error_rate`). Defaults to None (`max_keys`).
+        error_rate (float, optional): The acceptable false positive rate (for `bloom`). Defaults to 0.001.
+
+    Raises:
+        TypeError: If `source` or `destination` is not a string.
+
+    Returns:
+        None
+    """
+    if type(source) != str or type(destination) != str:
+        raise TypeError(
+            f"Invalid type for source or destination: {type(source)}, {type(destination)}"
+        )
+    keys = [key] if type(key) == str else list(key)
+    temporary = None
+    try:
+        with _open(source, "r", newline="") as f:
+            data = csv.reader(f)
+            headers = next(data, None)
+            for k in keys:
+                if headers is not None and k not in headers:
+                    raise KeyError(k)
+
+            # Write next to the destination and rename at the end, so a failed run keeps the
+            # old destination and `source` may be the destination itself.
+            temporary = _temporary(destination)
+            with _open(
+                temporary, "w", newline="", compression=_compression(destination, "w")
+            ) as out:
+                if headers is not None:
+                    writer = csv.writer(out)
+                    writer.writerow(headers)
+                    positions = [headers.index(k) for k in keys]
+                    rows = ((index, row) for index, row in enumerate(data) if row)
+                    _dedup_rows(
+                        rows,
+                        writer,
+                        positions,
+                        max_keys,
+                        partitions,
+                        bloom,
+                        capacity,
+                        error_rate,
+                    )
+        os.replace(temporary, destination)
+        temporary = None
+    except (FileNotFoundError, KeyError):
+        Shout.error(
+            f"Issue reading file: {source}\nMake sure it exists and the key is correct."
+        )
+        return None
+    finally:
+        if temporary is not None and os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def _dedup_rows(rows, writer, positions, max_keys, partitions, bloom, capacity, error_rate):
+    """
+    Writes the rows whose keys have not been seen before (see `dedup_csv`).
+
+    Args:
+        rows (iterator): The `(index, row)` pairs of the non-blank rows.
+        writer (csv.writer): The destination writer.
+        positions (list): The positions of the key columns.
+        max_keys (int): The largest number of keys held in memory.
+        partitions (int): The number of temporary partition files.
+        bloom (bool): Whether to use an approximate Bloom filter.
+        capacity (int): The expected number of distinct keys for `bloom` (or None for `max_keys`).
+        error_rate (float): The acceptable false positive rate for `bloom`.
+
+    Returns:
+        None
+    """
+
+    def identify(row):
+        return "\x1f".join(
+            row[position] if position < len(row) else "" for position in positions
+        )
+
+    if bloom:
+        seen = _BloomFilter(max_keys if capacity is None else capacity, error_rate)
+        for _, row in rows:
+            if not seen.add(identify(row)):
+                writer.writerow(row)
+        return None
+
+    seen = set()
+    for _, row in rows:
+        identity = identify(row)
+        if identity in seen:
+            continue
+        seen.add(identity)
+        writer.writerow(row)
+        if len(seen) >= max_keys:
+            break
+    else:
+        return None
+
+    # Over budget: spill the seen keys and the remaining rows by key hash.
+    directory = tempfile.mkdtemp(prefix="commoner-")
+    try:
+        names = range(partitions)
+        key_paths = [os.path.join(directory, f"keys-{number}.csv") for number in names]
+        row_paths = [os.path.join(directory, f"rows-{number}.csv") for number in names]
+        handles = [open(path, "w", newline="") for path in key_paths + row_paths]
+        try:
+            writers = [csv.writer(handle) for handle in handles]
+            for identity in seen:
+                writers[hash(identity) % partitions].writerow([identity])
+            seen = None
+            for index, row in rows:
+                number = hash(identify(row)) % partitions
+                writers[partitions + number].writerow([index] + row)
+        finally:
+            for handle in handles:
+                handle.close()
+
+        kept_paths = []
+        for key_path, row_path in zip(key_paths, row_paths):
+            with open(key_path, "r", newline="") as keys_file:
+                seen = {row[0] for row in csv.reader(keys_file)}
+            kept_path = row_path + ".kept"
+            with (
+                open(row_path, "r", newline="") as rows_file,
+                open(kept_path, "w", newline="") as kept_file,
+            ):
+                kept = csv.writer(kept_file)
+                for row in csv.reader(rows_file):
+                    identity = identify(row[1:])
+                    if identity not in seen:
+                        seen.add(identity)
+                        kept.writerow(row)
+            kept_paths.append(kept_path)
+        seen = None
+
+        writer.writerows(
+            row[1:]
+            for row in heapq.merge(
+                *[_read_run(path) for path in kept_paths], key=lambda row: int(row[0])
+            )
+        )
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
 def reverse(iterable):
     """
     Reverses a list, string, or dictionary.
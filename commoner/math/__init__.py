@@ -2,23 +2,151 @@
 A module for mathematical functions.
 
 Functions:
-    distance(token1, token2, display=False): Calculates the Levenshtein distance between two tokens.
+    distance(token1, token2, display=False, max_distance=None, cache=False): Calculates the Levenshtein distance between two tokens.
+    within_distance(token1, token2, max_distance): Checks whether two tokens are within a Levenshtein distance.
+    osa_distance(token1, token2, max_distance=None): Calculates the Damerau-Levenshtein (optimal string alignment) distance between two tokens.
+    hamming(token1, token2): Calculates the Hamming distance between two tokens of equal length.
+    jaro_winkler(token1, token2, prefix_weight=0.1): Calculates the Jaro-Winkler similarity between two tokens.
+    similarity(token1, token2, metric="levenshtein"): Calculates a normalized similarity (0 to 1) between two tokens.
+    distance_many(query, candidates, workers=1, max_distance=None, metric="levenshtein"): Calculates a metric between a token and many candidates.
+    distance_matrix(tokens1, tokens2, workers=1, max_distance=None, metric="levenshtein"): Calculates a metric between two lists of tokens.
+    alignment(token1, token2): Calculates the edit operations turning one token into another.
+    fuzzy_find(pattern, text, max_distance): Finds approximate occurrences of a pattern in a text.
+    cluster_csv(key, file, max_distance=1, block="length", partitions=64, workers=None): Clusters near-duplicate values of a csv column.
+    cache_info(): Returns the statistics of the shared distance cache.
+    cache_clear(): Clears the shared distance cache.
+
+Classes:
+    DistanceCache: A thread-safe, bounded LRU cache of Levenshtein distances.
+    BKTree: A fuzzy-search index over tokens using Levenshtein distance.
+    QGramIndex: An inverted q-gram index for filtering candidates before Levenshtein distance.
 """
+import csv
+import heapq
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy
 
-def distance(token1, token2, display=False):
+
+def _bitparallel_distance(token1, token2, max_distance=None):
     """
-    Calculates the Levenshtein distance between two tokens.
+    Calculates the Levenshtein distance with the bit-vector algorithm of Myers (as
+    formulated by Hyyrö), using `token1` as the pattern.
+
+    Args:
+        token1 (str): The pattern token (should be the shorter one).
+        token2 (str): The text token.
+        max_distance (int, optional): Stop as soon as the distance is known to exceed this. Defaults to None.
+
+    Returns:
+        int: The Levenshtein distance between the two tokens (or `max_distance + 1` if it is exceeded).
+    """
+    m = len(token1)
+    if m == 0:
+        return len(token2)
+
+    peq = {}
+    for i, char in enumerate(token1):
+        peq[char] = peq.get(char, 0) | (1 << i)
+
+    mask = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv = mask
+    mv = 0
+    score = m
+    remaining = len(token2)
+
+    for char in token2:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = (ph << 1) | 1
+        mh = mh << 1
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv & mask
+
+        # The last row changes by at most one per remaining character.
+        remaining -= 1
+        if max_distance is not None and score - remaining > max_distance:
+            return max_distance + 1
+
+    return score
+
+
+def _banded_distance(token1, token2, max_distance):
+    """
+    Calculates the Levenshtein distance restricted to a diagonal band of width
+    `2 * max_distance + 1` (Ukkonen), stopping once a whole row exceeds `max_distance`.
+
+    Args:
+        token1 (str): The first token (should be the shorter one).
+        token2 (str): The second token.
+        max_distance (int): The largest distance of interest.
+
+    Returns:
+        int: The Levenshtein distance between the two tokens (or `max_distance + 1` if it is exceeded).
+    """
+    n = len(token1)
+    m = len(token2)
+    over = max_distance + 1
+    if m - n > max_distance:
+        return over
+
+    previous = [over] * (m + 1)
+    current = [over] * (m + 1)
+    for t2 in range(min(max_distance, m) + 1):
+        previous[t2] = t2
+
+    for t1 in range(1, n + 1):
+        low = max(1, t1 - max_distance)
+        high = min(m, t1 + max_distance)
+        if low == 1 and t1 <= max_distance:
+            current[0] = t1
+        else:
+            current[low - 1] = over
+        char = token1[t1 - 1]
+        best = current[low - 1]
+        for t2 in range(low, high + 1):
+            if token2[t2 - 1] == char:
+                value = previous[t2 - 1]
+            else:
+                value = min(previous[t2], current[t2 - 1], previous[t2 - 1]) + 1
+            if value > over:
+                value = over
+            current[t2] = value
+            if value < best:
+                best = value
+        if best > max_distance:
+            return over
+        previous, current = current, previous
+
+    return previous[m]
+
+
+def _levenshtein_matrix(token1, token2):
+    """
+    Builds the full Levenshtein distance matrix between two tokens.
 
     Args:
         token1 (str): The first token.
         token2 (str): The second token.
-        display (bool, optional): Whether to display the distance matrix. Defaults to False.
 
     Returns:
-        int: The Levenshtein distance between the two tokens.
+        numpy.ndarray: The `(len(token1) + 1) x (len(token2) + 1)` distance matrix.
     """
-    distances = numpy.zeros((len(token1) + 1, len(token2) + 1))
+    distances = numpy.zeros((len(token1) + 1, len(token2) + 1), dtype=numpy.int64)
 
     for t1 in range(len(token1) + 1):
         distances[t1][0] = t1
@@ -26,29 +154,1553 @@ def distance(token1, token2, display=False):
     for t2 in range(len(token2) + 1):
         distances[0][t2] = t2
 
-    a = 0
-    b = 0
-    c = 0
-
     for t1 in range(1, len(token1) + 1):
         for t2 in range(1, len(token2) + 1):
-            if (token1[t1-1] == token2[t2-1]):
+            if token1[t1 - 1] == token2[t2 - 1]:
                 distances[t1][t2] = distances[t1 - 1][t2 - 1]
             else:
-                a = distances[t1][t2 - 1]
-                b = distances[t1 - 1][t2]
-                c = distances[t1 - 1][t2 - 1]
-
-                if (a <= b and a <= c):
-                    distances[t1][t2] = a + 1
-                elif (b <= a and b <= c):
-                    distances[t1][t2] = b + 1
-                else:
-                    distances[t1][t2] = c + 1
+                distances[t1][t2] = (
+                    min(
+                        distances[t1][t2 - 1],
+                        distances[t1 - 1][t2],
+                        distances[t1 - 1][t2 - 1],
+                    )
+                    + 1
+                )
+
+    return distances
+
+
+class DistanceCache:
+    """
+    A thread-safe, bounded LRU cache of Levenshtein distances.
+
+    Pairs are stored symmetrically, so `(a, b)` and `(b, a)` share an entry. Only exact
+    distances are stored; results cut off by `max_distance` are not.
+
+    Parameters:
+        capacity (int): The largest number of pairs to keep (optional).
+
+    Methods:
+        get(token1, token2): Gets a cached distance.
+        put(token1, token2, value): Caches a distance.
+        cache_info(): Returns the hit, miss and eviction counters.
+        cache_clear(): Clears the cache and its counters.
+
+    Examples:
+        >>> from commoner.math import DistanceCache, distance
+        >>> cache = DistanceCache(capacity=1000)
+        >>> distance("kitten", "sitting", cache=cache)
+        3
+        >>> distance("sitting", "kitten", cache=cache)
+        3
+        >>> cache.cache_info()
+        {"hits": 1, "misses": 1, "evictions": 0, "size": 1, "capacity": 1000}
+    """
+
+    def __init__(self, capacity=65536):
+        if type(capacity) != int or capacity < 1:
+            raise ValueError(f"Invalid capacity: {capacity}")
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def _key(token1, token2):
+        return (token1, token2) if token1 <= token2 else (token2, token1)
+
+    def get(self, token1, token2):
+        """
+        Gets a cached distance (counting a hit or a miss).
+
+        Parameters:
+            token1 (str): The first token.
+            token2 (str): The second token.
+
+        Returns:
+            int: The cached distance (or None if the pair is not cached).
+        """
+        key = self._key(token1, token2)
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, token1, token2, value):
+        """
+        Caches a distance, evicting the least recently used pair if the cache is full.
+
+        Parameters:
+            token1 (str): The first token.
+            token2 (str): The second token.
+            value (int): The distance.
+
+        Returns:
+            None
+        """
+        key = self._key(token1, token2)
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def cache_info(self):
+        """
+        Returns the hit, miss and eviction counters.
+
+        Returns:
+            dict: The `hits`, `misses`, `evictions`, `size` and `capacity` of the cache.
+        """
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self.entries),
+                "capacity": self.capacity,
+            }
+
+    def cache_clear(self):
+        """
+        Clears the cache and its counters.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+# The cache used by `distance(..., cache=True)`.
+_cache = DistanceCache()
+
+
+def cache_info():
+    """
+    Returns the statistics of the shared distance cache (used by `distance(..., cache=True)`).
+
+    Returns:
+        dict: The `hits`, `misses`, `evictions`, `size` and `capacity` of the cache.
+    """
+    return _cache.cache_info()
+
+
+def cache_clear():
+    """
+    Clears the shared distance cache (used by `distance(..., cache=True)`).
+
+    Returns:
+        None
+    """
+    _cache.cache_clear()
+
+
+def _distance(token1, token2, max_distance):
+    """
+    Calculates the Levenshtein distance with the fastest engine for the tokens.
+
+    Args:
+        token1 (str): The first token.
+        token2 (str): The second token.
+        max_distance (int): The largest distance of interest (or None).
+
+    Returns:
+        int: The Levenshtein distance between the two tokens (or `max_distance + 1` if it is exceeded).
+    """
+    if len(token1) > len(token2):
+        token1, token2 = token2, token1
+
+    if max_distance is not None:
+        if len(token2) - len(token1) > max_distance:
+            return max_distance + 1
+        # A band row costs a Python step per cell, a bit-vector row a few big-integer
+        # operations; the band only wins when it is far narrower than the tokens.
+        if (2 * max_distance + 1) * 512 < len(token1):
+            return _banded_distance(token1, token2, max_distance)
+        return _bitparallel_distance(token1, token2, max_distance)
+
+    return _bitparallel_distance(token1, token2)
+
+
+def distance(token1, token2, display=False, max_distance=None, cache=False):
+    """
+    Calculates the Levenshtein distance between two tokens.
+
+    Tokens are compared with a bit-parallel algorithm in linear space (or, when a small
+    `max_distance` is given for long tokens, a diagonal band around the main diagonal).
+    The full distance matrix is only built when `display` is set.
+
+    Args:
+        token1 (str): The first token.
+        token2 (str): The second token.
+        display (bool, optional): Whether to display the distance matrix (for debugging). Defaults to False.
+        max_distance (int, optional): The largest distance of interest. Once the distance is known to
+            exceed it, the computation stops early and `max_distance + 1` is returned. Defaults to None.
+        cache (bool or DistanceCache, optional): Whether to use the shared distance cache (or a
+            specific `DistanceCache`). Defaults to False.
+
+    Raises:
+        ValueError: If `max_distance` is negative.
+
+    Returns:
+        int: The Levenshtein distance between the two tokens.
+    """
+    if max_distance is not None and max_distance < 0:
+        raise ValueError(f"Invalid max_distance: {max_distance}")
+
     if display:
+        distances = _levenshtein_matrix(token1, token2)
         for t1 in range(len(token1) + 1):
             for t2 in range(len(token2) + 1):
                 print(int(distances[t1][t2]), end=" ")
             print()
+        result = int(distances[len(token1)][len(token2)])
+        if max_distance is not None:
+            return min(result, max_distance + 1)
+        return result
+
+    if cache is None or cache is False:
+        return _distance(token1, token2, max_distance)
+
+    if cache is True:
+        cache = _cache
+    result = cache.get(token1, token2)
+    if result is None:
+        result = _distance(token1, token2, max_distance)
+        if max_distance is None or result <= max_distance:
+            cache.put(token1, token2, result)
+    if max_distance is not None:
+        return min(result, max_distance + 1)
+    return result
+
+
+def within_distance(token1, token2, max_distance):
+    """
+    Checks whether two tokens are within a Levenshtein distance of each other.
+
+    Args:
+        token1 (str): The first token.
+        token2 (str): The second token.
+        max_distance (int): The largest allowed distance.
+
+    Returns:
+        bool: Whether the Levenshtein distance between the two tokens is at most `max_distance`.
+    """
+    return distance(token1, token2, max_distance=max_distance) <= max_distance
+
+
+def _bitparallel_osa(token1, token2, max_distance=None):
+    """
+    Calculates the optimal string alignment distance with the bit-vector algorithm of
+    Hyyrö, using `token1` as the pattern.
+
+    Args:
+        token1 (str): The pattern token (should be the shorter one).
+        token2 (str): The text token.
+        max_distance (int, optional): Stop as soon as the distance is known to exceed this. Defaults to None.
+
+    Returns:
+        int: The optimal string alignment distance (or `max_distance + 1` if it is exceeded).
+    """
+    m = len(token1)
+    if m == 0:
+        return len(token2)
+
+    peq = {}
+    for i, char in enumerate(token1):
+        peq[char] = peq.get(char, 0) | (1 << i)
+
+    mask = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv = mask
+    mv = 0
+    d0 = 0
+    previous_eq = 0
+    score = m
+    remaining = len(token2)
+
+    for char in token2:
+        eq = peq.get(char, 0)
+        tr = (((~d0) & eq) << 1) & previous_eq
+        d0 = ((((eq & pv) + pv) ^ pv) | eq | mv | tr) & mask
+        ph = mv | ~(d0 | pv)
+        mh = d0 & pv
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = (ph << 1) | 1
+        mh = mh << 1
+        pv = (mh | ~(d0 | ph)) & mask
+        mv = ph & d0 & mask
+        previous_eq = eq
+
+        remaining -= 1
+        if max_distance is not None and score - remaining > max_distance:
+            return max_distance + 1
+
+    return score
+
+
+def osa_distance(token1, token2, max_distance=None):
+    """
+    Calculates the Damerau-Levenshtein distance between two tokens, in its optimal string
+    alignment variant (adjacent transpositions count as one edit, but no substring is
+    edited twice).
+
+    Args:
+        token1 (str): The first token.
+        token2 (str): The second token.
+        max_distance (int, optional): The largest distance of interest (see `distance`). Defaults to None.
+
+    Raises:
+        ValueError: If `max_distance` is negative.
+
+    Returns:
+        int: The optimal string alignment distance between the two tokens.
+    """
+    if max_distance is not None and max_distance < 0:
+        raise ValueError(f"Invalid max_distance: {max_distance}")
+
+    if len(token1) > len(token2):
+        token1, token2 = token2, token1
+
+    if max_distance is not None and len(token2) - len(token1) > max_distance:
+        return max_distance + 1
+
+    return _bitparallel_osa(token1, token2, max_distance)
+
+
+def hamming(token1, token2):
+    """
+    Calculates the Hamming distance (the number of differing positions) between two tokens.
+
+    Args:
+        token1 (str): The first token.
+        token2 (str): The second token.
+
+    Raises:
+        ValueError: If the tokens have different lengths.
+
+    Returns:
+        int: The Hamming distance between the two tokens.
+    """
+    if len(token1) != len(token2):
+        raise ValueError(f"Tokens have different lengths: {len(token1)}, {len(token2)}")
+    return sum(char1 != char2 for char1, char2 in zip(token1, token2))
+
+
+def jaro_winkler(token1, token2, prefix_weight=0.1):
+    """
+    Calculates the Jaro-Winkler similarity between two tokens.
+
+    Args:
+        token1 (str): The first token.
+        token2 (str): The second token.
+        prefix_weight (float, optional): The boost given to a common prefix (up to 4 characters). Defaults to 0.1.
+
+    Raises:
+        ValueError: If `prefix_weight` is not between 0 and 0.25.
+
+    Returns:
+        float: The similarity, from 0 (nothing in common) to 1 (identical).
+    """
+    if not 0 <= prefix_weight <= 0.25:
+        raise ValueError(f"Invalid prefix_weight: {prefix_weight}")
+    if len(token1) == 0 and len(token2) == 0:
+        return 1.0
+    if len(token1) == 0 or len(token2) == 0:
+        return 0.0
+
+    window = max(0, max(len(token1), len(token2)) // 2 - 1)
+    matched1 = [False] * len(token1)
+    matched2 = [False] * len(token2)
+    matches = 0
+    for t1, char in enumerate(token1):
+        for t2 in range(max(0, t1 - window), min(len(token2), t1 + window + 1)):
+            if not matched2[t2] and token2[t2] == char:
+                matched1[t1] = True
+                matched2[t2] = True
+                matches += 1
+                break
+
+    if matches == 0:
+        return 0.0
+
+    transpositions = 0
+    t2 = 0
+    for t1, char in enumerate(token1):
+        if matched1[t1]:
+            while not matched2[t2]:
+                t2 += 1
+            if char != token2[t2]:
+                transpositions += 1
+            t2 += 1
+
+    jaro = (
+        matches / len(token1)
+        + matches / len(token2)
+        + (matches - transpositions // 2) / matches
+    ) / 3
+
+    prefix = 0
+    for char1, char2 in zip(token1[:4], token2[:4]):
+        if char1 != char2:
+            break
+        prefix += 1
+
+    return jaro + prefix * prefix_weight * (1 - jaro)
+
+
+def similarity(token1, token2, metric="levenshtein"):
+    """
+    Calculates a normalized similarity between two tokens.
+
+    Distance metrics are normalized as `1 - distance / max(len(token1), len(token2))`.
+
+    Args:
+        token1 (str): The first token.
+        token2 (str): The second token.
+        metric (str, optional): One of "levenshtein", "osa", "hamming" or "jaro_winkler". Defaults to "levenshtein".
+
+    Raises:
+        ValueError: If `metric` is not supported.
+
+    Returns:
+        float: The similarity, from 0 (nothing in common) to 1 (identical).
+    """
+    if metric == "jaro_winkler":
+        return jaro_winkler(token1, token2)
+    if metric not in ("levenshtein", "osa", "hamming"):
+        raise ValueError(f"Invalid metric: {metric}")
+    longest = max(len(token1), len(token2))
+    if longest == 0:
+        return 1.0
+    return 1 - _metrics[metric](token1, token2) / longest
+
+
+# Metrics available to the batch functions, by name.
+_metrics = {
+    "levenshtein": distance,
+    "osa": osa_distance,
+    "hamming": hamming,
+    "jaro_winkler": jaro_winkler,
+    "similarity": similarity,
+}
+_similarity_metrics = ("jaro_winkler", "similarity")
+# Metrics that accept `max_distance`.
+_cutoff_metrics = ("levenshtein", "osa")
+
+
+def _last_row(token1, token2):
+    """
+    Calculates the Levenshtein distance between `token1` and every prefix of `token2`
+    (the last row of the distance matrix) with the bit-vector algorithm.
+
+    Args:
+        token1 (str): The first token.
+        token2 (str): The second token.
+
+    Returns:
+        list: The `len(token2) + 1` distances.
+    """
+    m = len(token1)
+    if m == 0:
+        return list(range(len(token2) + 1))
+
+    peq = {}
+    for i, char in enumerate(token1):
+        peq[char] = peq.get(char, 0) | (1 << i)
+
+    mask = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv = mask
+    mv = 0
+    score = m
+    row = [score]
+
+    for char in token2:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = (ph << 1) | 1
+        mh = mh << 1
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv & mask
+        row.append(score)
+
+    return row
+
+
+def _hirschberg(token1, token2, offset1, offset2, operations):
+    """
+    Appends the edit operations turning `token1` into `token2` to `operations`, using
+    Hirschberg's divide-and-conquer algorithm.
+
+    Args:
+        token1 (str): The first token.
+        token2 (str): The second token.
+        offset1 (int): The position of `token1` in the original first token.
+        offset2 (int): The position of `token2` in the original second token.
+        operations (list): The list to append the operations to.
+
+    Returns:
+        None
+    """
+    if len(token1) == 0:
+        for t2 in range(len(token2)):
+            operations.append(("insert", offset1, offset2 + t2))
+        return
+
+    if len(token2) == 0:
+        for t1 in range(len(token1)):
+            operations.append(("delete", offset1 + t1, offset2))
+        return
+
+    if len(token1) == 1:
+        match = next((t2 for t2, char in enumerate(token2) if char == token1[0]), None)
+        if match is None:
+            operations.append(("substitute", offset1, offset2))
+            match = 0
+        for t2 in range(match):
+            operations.append(("insert", offset1, offset2 + t2))
+        for t2 in range(match + 1, len(token2)):
+            operations.append(("insert", offset1 + 1, offset2 + t2))
+        return
+
+    middle = len(token1) // 2
+    left = _last_row(token1[:middle], token2)
+    right = _last_row(token1[middle:][::-1], token2[::-1])
+    split = min(range(len(token2) + 1), key=lambda t2: left[t2] + right[len(token2) - t2])
+
+    _hirschberg(token1[:middle], token2[:split], offset1, offset2, operations)
+    _hirschberg(token1[middle:], token2[split:], offset1 + middle, offset2 + split, operations)
+
+
+def alignment(token1, token2):
+    """
+    Calculates the edit operations turning one token into another.
+
+    Uses Hirschberg's algorithm, so memory stays linear in the length of the tokens.
+    Each operation is a tuple `(operation, position1, position2)`:
+        ("substitute", i, j): Replace `token1[i]` with `token2[j]`.
+        ("delete", i, j): Delete `token1[i]` (`j` is the current position in `token2`).
+        ("insert", i, j): Insert `token2[j]` before `token1[i]`.
+
+    Args:
+        token1 (str): The first token.
+        token2 (str): The second token.
+
+    Returns:
+        list: The edit operations, in order (as many as the Levenshtein distance).
+    """
+    operations = []
+    _hirschberg(token1, token2, 0, 0, operations)
+    return operations
+
+
+def fuzzy_find(pattern, text, max_distance):
+    """
+    Finds approximate occurrences of a pattern in a text.
+
+    Uses the bit-parallel form of Sellers' algorithm, so the text is read once, one
+    character at a time, and can be any iterable of characters.
+
+    Args:
+        pattern (str): The pattern to search for.
+        text (str): The text to search in.
+        max_distance (int): The largest allowed Levenshtein distance of a match.
+
+    Raises:
+        ValueError: If `pattern` is empty or `max_distance` is negative.
+
+    Yields:
+        tuple: `(end, distance)` for every position where a match ends (`end` is exclusive,
+            so the match is a substring of `text[:end]`), in order.
+
+    Examples:
+        >>> from commoner.math import fuzzy_find
+        >>> list(fuzzy_find("survey", "a surgery", 2))
+        [(7, 2), (8, 2), (9, 2)]
+    """
+    if len(pattern) == 0:
+        raise ValueError("Pattern cannot be empty")
+    if max_distance < 0:
+        raise ValueError(f"Invalid max_distance: {max_distance}")
+
+    m = len(pattern)
+    peq = {}
+    for i, char in enumerate(pattern):
+        peq[char] = peq.get(char, 0) | (1 << i)
+
+    mask = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv = mask
+    mv = 0
+    score = m
+
+    for end, char in enumerate(text, 1):
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        # A match may start anywhere, so the top row stays at zero.
+        ph = ph << 1
+        mh = mh << 1
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv & mask
+        if score <= max_distance:
+            yield (end, score)
+
+
+# Candidates shared with every worker process (set once per worker by `_init_worker`).
+_candidates = None
+
+
+def _init_worker(candidates):
+    """
+    Stores the candidates in a worker process.
+
+    Args:
+        candidates (list): The candidate tokens.
+
+    Returns:
+        None
+    """
+    global _candidates
+    _candidates = candidates
+
+
+def _scores(metric, query, candidates, max_distance):
+    """
+    Calculates a metric between a query and each candidate.
+
+    Args:
+        metric (str): The name of the metric.
+        query (str): The query token.
+        candidates (list): The candidate tokens.
+        max_distance (int): The largest distance of interest (or None).
+
+    Returns:
+        list: The values of the metric (-1 for "hamming" between tokens of different lengths).
+    """
+    function = _metrics[metric]
+    if metric == "hamming":
+        return [
+            function(query, candidate) if len(query) == len(candidate) else -1
+            for candidate in candidates
+        ]
+    if max_distance is None:
+        return [function(query, candidate) for candidate in candidates]
+    return [function(query, candidate, max_distance=max_distance) for candidate in candidates]
+
+
+def _distance_rows(queries, max_distance, metric):
+    """
+    Calculates a metric between each query and the shared candidates.
+
+    Args:
+        queries (list): The query tokens.
+        max_distance (int): The largest distance of interest (or None).
+        metric (str): The name of the metric.
+
+    Returns:
+        list: One list of values per query.
+    """
+    return [_scores(metric, query, _candidates, max_distance) for query in queries]
+
+
+def _distance_chunk(query, start, stop, max_distance, metric):
+    """
+    Calculates a metric between a query and a slice of the shared candidates.
+
+    Args:
+        query (str): The query token.
+        start (int): The index of the first candidate.
+        stop (int): The index after the last candidate.
+        max_distance (int): The largest distance of interest (or None).
+        metric (str): The name of the metric.
+
+    Returns:
+        list: The values of the metric.
+    """
+    return _scores(metric, query, _candidates[start:stop], max_distance)
+
+
+def _chunks(size, workers, chunk_size):
+    """
+    Splits `range(size)` into `(start, stop)` chunks.
+
+    Args:
+        size (int): The number of items.
+        workers (int): The number of worker processes.
+        chunk_size (int): The number of items per chunk (or None to pick one from `workers`).
+
+    Returns:
+        list: The `(start, stop)` pairs.
+    """
+    if chunk_size is None:
+        chunk_size = max(1, -(-size // (workers * 4)))
+    return [(start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)]
+
+
+def _workers(workers):
+    """
+    Validates a number of worker processes.
+
+    Args:
+        workers (int): The number of worker processes (or None for the number of CPUs).
+
+    Raises:
+        ValueError: If `workers` is not a positive integer.
+
+    Returns:
+        int: The number of worker processes.
+    """
+    if workers is None:
+        return os.cpu_count() or 1
+    if type(workers) != int or workers < 1:
+        raise ValueError(f"Invalid number of workers: {workers}")
+    return workers
+
+
+def _dtype(metric, max_distance):
+    """
+    Validates a metric and picks its array type.
+
+    Args:
+        metric (str): The name of the metric.
+        max_distance (int): The largest distance of interest (or None).
+
+    Raises:
+        ValueError: If `metric` is not supported, or does not accept `max_distance`.
+
+    Returns:
+        type: `numpy.float64` for similarities, `numpy.int64` for distances.
+    """
+    if metric not in _metrics:
+        raise ValueError(f"Invalid metric: {metric}")
+    if max_distance is not None and metric not in _cutoff_metrics:
+        raise ValueError(f"max_distance is not supported by the {metric} metric")
+    return numpy.float64 if metric in _similarity_metrics else numpy.int64
+
+
+def distance_many(
+    query, candidates, workers=1, chunk_size=None, max_distance=None, metric="levenshtein"
+):
+    """
+    Calculates a metric (the Levenshtein distance by default) between a token and many candidates.
+
+    With `workers` above 1, the candidates are split into chunks that are spread over a
+    process pool; starting the pool has a fixed cost, so this only pays off for large batches.
+
+    Args:
+        query (str): The token to compare.
+        candidates (iterable): The tokens to compare against.
+        workers (int, optional): The number of worker processes (1 runs in the current process, None uses the number of CPUs). Defaults to 1.
+        chunk_size (int, optional): The number of candidates per task. Defaults to None (chosen from `workers`).
+        max_distance (int, optional): The largest distance of interest (see `distance`; "levenshtein" and "osa" only). Defaults to None.
+        metric (str, optional): One of "levenshtein", "osa", "hamming" (-1 for tokens of different lengths), "jaro_winkler" or "similarity". Defaults to "levenshtein".
+
+    Raises:
+        ValueError: If `workers` is not a positive integer, `metric` is not supported or `max_distance` is given for a metric that does not accept it.
+
+    Returns:
+        numpy.ndarray: The values (integers for distances, floats for similarities), in the order of `candidates`.
+    """
+    candidates = list(candidates)
+    workers = _workers(workers)
+    dtype = _dtype(metric, max_distance)
+    if workers == 1 or len(candidates) < 2:
+        return numpy.array(_scores(metric, query, candidates, max_distance), dtype=dtype)
+
+    result = numpy.empty(len(candidates), dtype=dtype)
+    chunks = _chunks(len(candidates), workers, chunk_size)
+    with ProcessPoolExecutor(
+        workers, initializer=_init_worker, initargs=(candidates,)
+    ) as pool:
+        futures = [
+            (
+                start,
+                stop,
+                pool.submit(_distance_chunk, query, start, stop, max_distance, metric),
+            )
+            for start, stop in chunks
+        ]
+        for start, stop, future in futures:
+            result[start:stop] = future.result()
+    return result
+
+
+def distance_matrix(
+    tokens1, tokens2, workers=1, chunk_size=None, max_distance=None, metric="levenshtein"
+):
+    """
+    Calculates a metric (the Levenshtein distance by default) between every pair of tokens from two lists.
+
+    With `workers` above 1, the rows are split into chunks that are spread over a process
+    pool; starting the pool has a fixed cost, so this only pays off for large batches.
+
+    Args:
+        tokens1 (iterable): The tokens for the rows.
+        tokens2 (iterable): The tokens for the columns.
+        workers (int, optional): The number of worker processes (1 runs in the current process, None uses the number of CPUs). Defaults to 1.
+        chunk_size (int, optional): The number of rows per task. Defaults to None (chosen from `workers`).
+        max_distance (int, optional): The largest distance of interest (see `distance`; "levenshtein" and "osa" only). Defaults to None.
+        metric (str, optional): One of "levenshtein", "osa", "hamming" (-1 for tokens of different lengths), "jaro_winkler" or "similarity". Defaults to "levenshtein".
+
+    Raises:
+        ValueError: If `workers` is not a positive integer, `metric` is not supported or `max_distance` is given for a metric that does not accept it.
+
+    Returns:
+        numpy.ndarray: A `len(tokens1) x len(tokens2)` array of values (integers for distances, floats for similarities).
+    """
+    tokens1 = list(tokens1)
+    tokens2 = list(tokens2)
+    workers = _workers(workers)
+    dtype = _dtype(metric, max_distance)
+    result = numpy.empty((len(tokens1), len(tokens2)), dtype=dtype)
+    if workers == 1 or len(tokens1) < 2:
+        for row, token1 in enumerate(tokens1):
+            result[row] = _scores(metric, token1, tokens2, max_distance)
+        return result
+
+    chunks = _chunks(len(tokens1), workers, chunk_size)
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(tokens2,)) as pool:
+        futures = [
+            (
+                start,
+                stop,
+                pool.submit(_distance_rows, tokens1[start:stop], max_distance, metric),
+            )
+            for start, stop in chunks
+        ]
+        for start, stop, future in futures:
+            result[start:stop] = numpy.array(future.result(), dtype=dtype).reshape(
+                stop - start, len(tokens2)
+            )
+    return result
+
+
+class BKTree:
+    """
+    A fuzzy-search index over tokens using Levenshtein distance (a Burkhard-Keller tree).
+
+    Every node stores a token and its children keyed by their distance to it, so the
+    triangle inequality rules out most of the tree on each lookup.
+
+    Parameters:
+        tokens (iterable, optional): The tokens to index.
+
+    Methods:
+        add(token): Adds a token to the index.
+        search(token, max_distance): Finds all tokens within a distance of a token.
+        nearest(token, k): Finds the k tokens closest to a token.
+
+    Examples:
+        >>> from commoner.math import BKTree
+        >>> index = BKTree(["book", "books", "cake", "boo", "cape"])
+        >>> index.search("bo", 2)
+        [(1, "boo"), (2, "book")]
+        >>> index.nearest("cakes", 1)
+        [(1, "cake")]
+    """
+
+    def __init__(self, tokens=None):
+        self.root = None
+        self.size = 0
+        if tokens is not None:
+            for token in tokens:
+                self.add(token)
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, token):
+        return len(self.search(token, 0)) > 0
+
+    def __iter__(self):
+        if self.root is None:
+            return
+        nodes = [self.root]
+        while nodes:
+            node = nodes.pop()
+            yield node[0]
+            nodes.extend(node[1].values())
+
+    def add(self, token):
+        """
+        Adds a token to the index (tokens already in the index are ignored).
+
+        Parameters:
+            token (str): The token to add.
+
+        Returns:
+            None
+        """
+        if self.root is None:
+            self.root = (token, {})
+            self.size += 1
+            return
+
+        node = self.root
+        while True:
+            d = distance(token, node[0])
+            if d == 0:
+                return
+            child = node[1].get(d)
+            if child is None:
+                node[1][d] = (token, {})
+                self.size += 1
+                return
+            node = child
+
+    def search(self, token, max_distance):
+        """
+        Finds all tokens within a distance of a token.
+
+        Parameters:
+            token (str): The token to search for.
+            max_distance (int): The largest allowed distance.
+
+        Returns:
+            list: `(distance, token)` pairs, closest first.
+        """
+        results = []
+        if self.root is None:
+            return results
+
+        nodes = [self.root]
+        while nodes:
+            node = nodes.pop()
+            d = distance(token, node[0])
+            if d <= max_distance:
+                results.append((d, node[0]))
+            for key, child in node[1].items():
+                if d - max_distance <= key <= d + max_distance:
+                    nodes.append(child)
+
+        results.sort()
+        return results
+
+    def nearest(self, token, k=1):
+        """
+        Finds the k tokens closest to a token.
+
+        Parameters:
+            token (str): The token to search for.
+            k (int): The number of tokens to find (optional).
+
+        Returns:
+            list: Up to `k` `(distance, token)` pairs, closest first.
+        """
+        if self.root is None or k < 1:
+            return []
+
+        # Max-heap (by negated distance) of the best k tokens found so far.
+        best = []
+        nodes = [self.root]
+        while nodes:
+            node = nodes.pop()
+            d = distance(token, node[0])
+            if len(best) < k:
+                heapq.heappush(best, (-d, node[0]))
+            elif d < -best[0][0]:
+                heapq.heapreplace(best, (-d, node[0]))
+            radius = -best[0][0] if len(best) == k else None
+            for key, child in node[1].items():
+                if radius is None or d - radius <= key <= d + radius:
+                    nodes.append(child)
+
+        return sorted((-d, found) for d, found in best)
+
+
+class QGramIndex:
+    """
+    An inverted q-gram index for filtering candidates before Levenshtein distance.
+
+    Tokens within distance k of a query share at least `max(len) - q + 1 - k * q` of
+    their q-grams with it (the count filter), so only tokens passing that filter are
+    verified with `distance`.
+
+    Parameters:
+        tokens (iterable, optional): The tokens to index.
+        q (int): The length of the q-grams (optional).
+
+    Methods:
+        add(token): Adds a token to the index.
+        search(token, max_distance): Finds all tokens within a distance of a token.
+        save(file): Saves the index to a file.
+        load(file): Loads an index from a file.
+        from_csv(key, file, q): Builds an index from a csv column.
+
+    Examples:
+        >>> from commoner.math import QGramIndex
+        >>> index = QGramIndex(["apple", "apply", "ample", "maple"], q=2)
+        >>> index.search("appel", 2)
+        [(2, "apple"), (2, "apply")]
+    """
+
+    def __init__(self, tokens=None, q=2):
+        if type(q) != int or q < 1:
+            raise ValueError(f"Invalid q-gram length: {q}")
+        self.q = q
+        self.tokens = []
+        self.postings = {}
+        if tokens is not None:
+            for token in tokens:
+                self.add(token)
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def __iter__(self):
+        return iter(self.tokens)
+
+    def _grams(self, token):
+        """
+        Counts the q-grams of a token.
+
+        Parameters:
+            token (str): The token.
+
+        Returns:
+            dict: The number of occurrences of each q-gram.
+        """
+        grams = {}
+        for i in range(len(token) - self.q + 1):
+            gram = token[i : i + self.q]
+            grams[gram] = grams.get(gram, 0) + 1
+        return grams
+
+    def add(self, token):
+        """
+        Adds a token to the index.
+
+        Parameters:
+            token (str): The token to add.
+
+        Returns:
+            None
+        """
+        index = len(self.tokens)
+        self.tokens.append(token)
+        for gram, count in self._grams(token).items():
+            self.postings.setdefault(gram, []).append((index, count))
+
+    def search(self, token, max_distance):
+        """
+        Finds all tokens within a distance of a token.
+
+        Parameters:
+            token (str): The token to search for.
+            max_distance (int): The largest allowed distance.
+
+        Returns:
+            list: `(distance, token)` pairs, closest first.
+        """
+        shared = {}
+        for gram, count in self._grams(token).items():
+            for index, other in self.postings.get(gram, ()):
+                shared[index] = shared.get(index, 0) + min(count, other)
+
+        # Tokens too short to be sure of sharing a q-gram cannot be filtered.
+        loose = len(token) - self.q + 1 - max_distance * self.q <= 0
+        candidates = range(len(self.tokens)) if loose else shared
+
+        results = []
+        for index in candidates:
+            candidate = self.tokens[index]
+            if abs(len(candidate) - len(token)) > max_distance:
+                continue
+            threshold = max(len(candidate), len(token)) - self.q + 1 - max_distance * self.q
+            if shared.get(index, 0) < threshold:
+                continue
+            d = distance(token, candidate, max_distance=max_distance)
+            if d <= max_distance:
+                results.append((d, candidate))
+
+        results.sort()
+        return results
+
+    def save(self, file):
+        """
+        Saves the index to a file.
+
+        Parameters:
+            file (str): The file to save to.
+
+        Raises:
+            TypeError: If `file` is not a string.
+
+        Returns:
+            None
+        """
+        if type(file) != str:
+            raise TypeError(f"Invalid type for file: {type(file)}")
+        with open(file, "w") as f:
+            json.dump({"q": self.q, "tokens": self.tokens, "postings": self.postings}, f)
+
+    @classmethod
+    def load(cls, file):
+        """
+        Loads an index saved with `save`.
+
+        Parameters:
+            file (str): The file to load from.
+
+        Raises:
+            TypeError: If `file` is not a string.
+
+        Returns:
+            QGramIndex: The loaded index.
+        """
+        if type(file) != str:
+            raise TypeError(f"Invalid type for file: {type(file)}")
+        with open(file, "r") as f:
+            data = json.load(f)
+        index = cls(q=data["q"])
+        index.tokens = data["tokens"]
+        index.postings = {
+            gram: [tuple(posting) for posting in postings]
+            for gram, postings in data["postings"].items()
+        }
+        return index
+
+    @classmethod
+    def from_csv(cls, key, file, q=2):
+        """
+        Builds an index from a csv column.
+
+        Parameters:
+            key (str): The column key or header.
+            file (str): The csv file to read from.
+            q (int): The length of the q-grams (optional).
+
+        Returns:
+            QGramIndex: The index (or None if the column could not be read).
+        """
+        from .. import get_csv_col
+
+        column = get_csv_col(key, file)
+        if column is None:
+            return None
+        return cls(column, q=q)
+
+
+def _block_key(value, block):
+    """
+    Calculates the blocking key of a value.
+
+    Args:
+        value (str): The value.
+        block (str or callable): "length", "prefix", "qgram" or a function of the value.
+
+    Returns:
+        object: The blocking key.
+    """
+    if block == "length":
+        return len(value)
+    if block == "prefix":
+        return value[:2].lower()
+    if block == "qgram":
+        return min((value[i : i + 2].lower() for i in range(len(value) - 1)), default=value)
+    return block(value)
+
+
+class _DeletionIndex:
+    """
+    An index of the strings left by deleting up to `max_distance` characters from each
+    token (symmetric deletion): tokens within that Levenshtein distance always share one,
+    so only tokens sharing one are verified with `distance`. Fast for small distances,
+    as a token of length n has about `n ** max_distance` deletions.
+
+    Parameters:
+        max_distance (int): The largest distance searched for.
+    """
+
+    def __init__(self, max_distance):
+        self.max_distance = max_distance
+        self.deletions = {}
+
+    def _deletions(self, token):
+        """
+        Lists the strings left by deleting up to `max_distance` characters from a token.
+
+        Parameters:
+            token (str): The token.
+
+        Returns:
+            set: The strings.
+        """
+        level = {token}
+        result = {token}
+        for _ in range(self.max_distance):
+            level = {item[:i] + item[i + 1 :] for item in level for i in range(len(item))}
+            result |= level
+        return result
+
+    def add(self, token):
+        """
+        Adds a token to the index.
+
+        Parameters:
+            token (str): The token to add.
+
+        Returns:
+            None
+        """
+        for deletion in self._deletions(token):
+            self.deletions.setdefault(deletion, []).append(token)
+
+    def search(self, token, max_distance):
+        """
+        Finds all tokens within a distance of a token.
+
+        Parameters:
+            token (str): The token to search for.
+            max_distance (int): The largest allowed distance (at most the index's).
+
+        Returns:
+            list: `(distance, token)` pairs, closest first.
+        """
+        candidates = set()
+        for deletion in self._deletions(token):
+            candidates.update(self.deletions.get(deletion, ()))
+        results = []
+        for candidate in candidates:
+            d = distance(token, candidate, max_distance=max_distance)
+            if d <= max_distance:
+                results.append((d, candidate))
+        results.sort()
+        return results
+
+
+def _cluster_index(max_distance):
+    """
+    Picks the index used to find the near-duplicates of a value while clustering.
+
+    Args:
+        max_distance (int): The largest distance between two values of a cluster.
+
+    Returns:
+        _DeletionIndex or QGramIndex: An empty index.
+    """
+    if max_distance <= 2:
+        return _DeletionIndex(max_distance)
+    return QGramIndex()
+
+
+def _cluster_block(entries, max_distance):
+    """
+    Clusters the values of a block (single linkage, union-find over a search index).
+
+    Args:
+        entries (list): `(index, value)` pairs.
+        max_distance (int): The largest distance between two values of a cluster.
+
+    Returns:
+        list: `(index, value, cluster)` triples, where `cluster` is the smallest index in the cluster.
+    """
+    # Identical values always share a cluster, so only distinct values are compared.
+    groups = {}
+    for index, value in entries:
+        groups.setdefault(value, []).append(index)
+    values = list(groups)
+    parents = list(range(len(values)))
+
+    def find(node):
+        while parents[node] != node:
+            parents[node] = parents[parents[node]]
+            node = parents[node]
+        return node
+
+    # Each value is only compared with the earlier values the index cannot rule out.
+    ids = {value: i for i, value in enumerate(values)}
+    index = _cluster_index(max_distance)
+    for i, value in enumerate(values):
+        for _, other in index.search(value, max_distance):
+            parents[find(i)] = find(ids[other])
+        index.add(value)
+
+    clusters = {}
+    for i, value in enumerate(values):
+        root = find(i)
+        clusters[root] = min(clusters.get(root, groups[value][0]), groups[value][0])
+
+    return [
+        (index, value, clusters[find(i)])
+        for i, value in enumerate(values)
+        for index in groups[value]
+    ]
+
+
+def _cluster_partition(path, max_distance, block):
+    """
+    Clusters the values of a partition file, block by block.
+
+    Args:
+        path (str): The partition file (rows of index and value).
+        max_distance (int): The largest distance between two values of a cluster.
+        block (str or callable): The blocking key (see `cluster_csv`).
+
+    Returns:
+        list: `(index, value, cluster)` triples.
+    """
+    blocks = {}
+    with open(path, "r", newline="") as f:
+        for index, value in csv.reader(f):
+            blocks.setdefault(_block_key(value, block), []).append((int(index), value))
+
+    results = []
+    for entries in blocks.values():
+        results.extend(_cluster_block(entries, max_distance))
+    return results
+
+
+def _length_files(directory, rows, buffer_rows=1 << 16):
+    """
+    Spills `(index, value)` rows to one temporary file per value length.
+
+    Args:
+        directory (str): The directory for the files.
+        rows (iterable): The `(index, value)` rows, in file order.
+        buffer_rows (int, optional): The number of rows buffered between writes. Defaults to 65536.
+
+    Returns:
+        list: The lengths that have a file, in increasing order.
+    """
+    lengths = set()
+    buffers = {}
+    buffered = 0
+
+    def flush():
+        for length, entries in buffers.items():
+            with open(os.path.join(directory, f"{length}.csv"), "a", newline="") as f:
+                csv.writer(f).writerows(entries)
+        buffers.clear()
+
+    for index, value in rows:
+        lengths.add(len(value))
+        buffers.setdefault(len(value), []).append((index, value))
+        buffered += 1
+        if buffered == buffer_rows:
+            flush()
+            buffered = 0
+    flush()
+    return sorted(lengths)
+
+
+def _read_length(directory, length):
+    """
+    Streams the `(index, value)` rows of a length file.
+
+    Args:
+        directory (str): The directory of the files.
+        length (int): The value length.
+
+    Yields:
+        tuple: The rows.
+    """
+    with open(os.path.join(directory, f"{length}.csv"), "r", newline="") as f:
+        for index, value in csv.reader(f):
+            yield int(index), value
+
+
+def _cluster_lengths(directory, lengths, max_distance):
+    """
+    Clusters length files (single linkage), comparing each value with the values whose
+    lengths differ by at most `max_distance`.
+
+    Lengths are processed in increasing order with a search index per length in a sliding
+    window, so only the values of `max_distance + 1` lengths are held in memory, plus two
+    integers per distinct value for the union-find.
+
+    Args:
+        directory (str): The directory of the files.
+        lengths (list): The lengths that have a file, in increasing order.
+        max_distance (int): The largest distance between two values of a cluster.
+
+    Yields:
+        tuple: `(index, value, cluster)` triples, by increasing length.
+    """
+    parents = []
+    smallest = []
+
+    def find(node):
+        while parents[node] != node:
+            parents[node] = parents[parents[node]]
+            node = parents[node]
+        return node
+
+    window = {}
+    for length in lengths:
+        for other in [other for other in window if other < length - max_distance]:
+            del window[other]
+        index = _cluster_index(max_distance)
+        ids = {}
+        window[length] = (index, ids)
+        for row, value in _read_length(directory, length):
+            if value in ids:
+                continue
+            node = ids[value] = len(parents)
+            parents.append(node)
+            smallest.append(row)
+            for other_index, other_ids in window.values():
+                for _, other in other_index.search(value, max_distance):
+                    parents[find(node)] = find(other_ids[other])
+            index.add(value)
+    window = None
+
+    clusters = {}
+    for node, index in enumerate(smallest):
+        root = find(node)
+        clusters[root] = min(clusters.get(root, index), index)
+
+    # Read the files again in the same order, so values get the same ids.
+    count = 0
+    for length in lengths:
+        ids = {}
+        for index, value in _read_length(directory, length):
+            if value not in ids:
+                ids[value] = count
+                count += 1
+            yield index, value, clusters[find(ids[value])]
+
+
+def cluster_csv(key, file, max_distance=1, block="length", partitions=64, workers=None):
+    """
+    Clusters near-duplicate values of a csv column.
+
+    The column is streamed once and spilled to temporary files, and values are only
+    compared (through a search index) with values that could be within `max_distance`.
+
+    With "length" blocking, which is exact, each value is compared with the values whose
+    lengths differ by at most `max_distance`; lengths are processed in order with a
+    sliding window, so memory holds the values of `max_distance + 1` lengths plus two
+    integers per distinct value. Other blocking schemes spill to `partitions` files by
+    blocking key and process the blocks in parallel across worker processes, with memory
+    bounded by the largest partition; they are a heuristic, as near-duplicates with
+    different blocking keys are never compared.
+
+    Args:
+        key (str): The column key or header.
+        file (str): The csv file to read from.
+        max_distance (int, optional): The largest Levenshtein distance between two values of a cluster. Defaults to 1.
+        block (str or callable, optional): "length" (value length), "prefix" (first two characters),
+            "qgram" (smallest 2-gram) or a top-level function of the value. Defaults to "length".
+        partitions (int, optional): The number of temporary partition files (other than "length" blocking). Defaults to 64.
+        workers (int, optional): The number of worker processes (1 runs in the current process; other than "length" blocking). Defaults to the number of CPUs.
+
+    Raises:
+        TypeError: If `key` or `file` is not a string.
+        ValueError: If `workers` or `partitions` is not a positive integer, or `block` is not supported.
+
+    Yields:
+        tuple: `(index, value, cluster)` for every row, grouped by length or block, where
+            `index` is the row number and `cluster` is the row number of the cluster's first row.
+    """
+    if type(key) != str:
+        raise TypeError(f"Invalid type for key: {type(key)}")
+    if type(file) != str:
+        raise TypeError(f"Invalid type for file: {type(file)}")
+    if type(partitions) != int or partitions < 1:
+        raise ValueError(f"Invalid number of partitions: {partitions}")
+    if block not in ("length", "prefix", "qgram") and not callable(block):
+        raise ValueError(f"Invalid block: {block}")
+    return _cluster_csv(key, file, max_distance, block, partitions, _workers(workers))
+
+
+def _cluster_csv(key, file, max_distance, block, partitions, workers):
+    """
+    Generator behind `cluster_csv` (kept separate so argument errors are raised on call).
+
+    Args:
+        key (str): The column key or header.
+        file (str): The csv file to read from.
+        max_distance (int): The largest Levenshtein distance between two values of a cluster.
+        block (str or callable): The blocking scheme.
+        partitions (int): The number of temporary partition files.
+        workers (int): The number of worker processes.
+
+    Yields:
+        tuple: `(index, value, cluster)` for every row.
+    """
+    from .. import Shout, _open
+
+    def values(f):
+        for index, row in enumerate(csv.DictReader(f)):
+            value = row[key]
+            yield index, "" if value is None else value
+
+    directory = tempfile.mkdtemp(prefix="commoner-")
+    try:
+        if block == "length":
+            try:
+                with _open(file, "r", newline="") as f:
+                    lengths = _length_files(directory, values(f))
+            except (FileNotFoundError, KeyError):
+                Shout.error(
+                    f"Issue reading file: {file}\nMake sure it exists and the key is correct."
+                )
+                return
+            yield from _cluster_lengths(directory, lengths, max_distance)
+            return
+
+        paths = [os.path.join(directory, f"{number}.csv") for number in range(partitions)]
+        handles = [open(path, "w", newline="") for path in paths]
+        try:
+            writers = [csv.writer(handle) for handle in handles]
+            with _open(file, "r", newline="") as f:
+                for index, value in values(f):
+                    number = hash(_block_key(value, block)) % partitions
+                    writers[number].writerow((index, value))
+        except (FileNotFoundError, KeyError):
+            Shout.error(
+                f"Issue reading file: {file}\nMake sure it exists and the key is correct."
+            )
+            return
+        finally:
+            for handle in handles:
+                handle.close()
+
+        paths = [path for path in paths if os.path.getsize(path) > 0]
+        if workers == 1:
+            for path in paths:
+                yield from _cluster_partition(path, max_distance, block)
+            return
 
-    return distances[len(token1)][len(token2)]
\ No newline at end of file
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [
+                pool.submit(_cluster_partition, path, max_distance, block) for path in paths
+            ]
+            for future in futures:
+                yield from future.result()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -5,6 +5,7 @@ Classes:
     Dict: An extension of the dict type with additional functionality.
     Text: An extension of the str type with additional functionality.
 """
+from ..math import fuzzy_find
 
 
 class Dict:
@@ -105,6 +106,7 @@ class Text:
         to_kebab(): Converts the text to kebab case.
         to_actual_title(): Converts the text to an actual title (e.g. "this is a title" -> "This Is a Title").
         to_initials(case_sensitive): Converts the text to initials (e.g. "this is a title" -> "T.I.a.T") (case sensitive by default).
+        fuzzy_find(pattern, max_distance): Finds approximate occurrences of a pattern in the text.
 
     Examples:
         >>> from commoner.types import Text
@@ -382,3 +384,16 @@ class Text:
                 word = word.upper()
             initials += word[0] + "."
         return initials
+
+    def fuzzy_find(self, pattern, max_distance):
+        """
+        Finds approximate occurrences of a pattern in the text (see `commoner.math.fuzzy_find`).
+
+        Parameters:
+            pattern (str): The pattern to search for.
+            max_distance (int): The largest allowed Levenshtein distance of a match.
+
+        Returns:
+            generator: `(end, distance)` for every position where a match ends.
+        """
+        return fuzzy_find(pattern, self.text, max_distance)
@@ -0,0 +1,200 @@
+import csv
+import gzip
+import os
+import random
+
+import numpy
+import pytest
+
+import commoner
+
+
+def write_rows(path, headers, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        writer.writerows(rows)
+    return str(path)
+
+
+def read_rows(path):
+    with commoner._open(str(path), "r", newline="") as f:
+        return list(csv.reader(f))
+
+
+@pytest.fixture(autouse=True)
+def seed():
+    random.seed(0)
+
+
+def test_sort_csv_round_trip(tmp_path):
+    rows = [[str(random.randint(0, 50)), str(i)] for i in range(2000)]
+    source = write_rows(tmp_path / "source.csv", ["Key", "Index"], rows)
+    destination = str(tmp_path / "sorted.csv")
+    for workers in (1, 2):
+        for reverse in (False, True):
+            commoner.sort_csv(
+                source, destination, "Key", True, reverse, run_size=150, workers=workers
+            )
+            expected = sorted(rows, key=lambda row: int(row[0]), reverse=reverse)
+            assert read_rows(destination) == [["Key", "Index"]] + expected
+
+
+def test_sort_csv_blank_runs_and_ragged_rows(tmp_path):
+    source = tmp_path / "source.csv"
+    source.write_text("K,V\n3,c\n\n1,a\n2,b\n")
+    destination = str(tmp_path / "sorted.csv")
+    commoner.sort_csv(str(source), destination, "K", run_size=1)
+    assert read_rows(destination) == [["K", "V"], ["1", "a"], ["2", "b"], ["3", "c"]]
+
+    source.write_text("A,B,C\n1,2,3\n4,5\n0,0,1\n")
+    commoner.sort_csv(str(source), destination, "C", numeric=True)
+    assert read_rows(destination) == [
+        ["A", "B", "C"],
+        ["0", "0", "1"],
+        ["1", "2", "3"],
+        ["4", "5"],
+    ]
+
+
+def test_sort_csv_non_numeric_values_last(tmp_path):
+    source = write_rows(
+        tmp_path / "source.csv", ["K"], [["5"], ["nan"], ["1"], [""], ["10"], ["x"], ["-inf"]]
+    )
+    destination = str(tmp_path / "sorted.csv")
+    commoner.sort_csv(source, destination, "K", numeric=True)
+    assert [row[0] for row in read_rows(destination)[1:]] == [
+        "-inf",
+        "1",
+        "5",
+        "10",
+        "nan",
+        "",
+        "x",
+    ]
+    commoner.sort_csv(source, destination, "K", numeric=True, reverse=True)
+    assert [row[0] for row in read_rows(destination)[1:]] == [
+        "10",
+        "5",
+        "1",
+        "-inf",
+        "nan",
+        "",
+        "x",
+    ]
+
+
+def test_join_csv_paths_agree(tmp_path):
+    for _ in range(20):
+        left = [
+            [random.choice("123"), random.choice("ab")][: random.choice([1, 2, 2])]
+            for _ in range(random.randint(1, 30))
+        ]
+        right = [
+            [random.choice("124"), "r", "x"][: random.choice([1, 3, 3])]
+            for _ in range(random.randint(1, 30))
+        ]
+        left_file = write_rows(tmp_path / "left.csv", ["K", "X"], left)
+        right_file = write_rows(tmp_path / "right.csv", ["K", "Y", "X"], right)
+        for how in ("inner", "left", "right", "outer"):
+            memory = list(commoner.join_csv(left_file, right_file, "K", how))
+            grace = list(
+                commoner.join_csv(left_file, right_file, "K", how, max_rows=2, partitions=5)
+            )
+
+            def key(row):
+                return sorted((name, str(value)) for name, value in row.items())
+
+            assert sorted(map(key, memory)) == sorted(map(key, grace))
+
+        expected = [
+            (row[0], row[1] if len(row) > 1 else None, other[1] if len(other) > 1 else None)
+            for row in left
+            for other in right
+            if row[0] == other[0]
+        ]
+        memory = list(commoner.join_csv(left_file, right_file, "K"))
+        assert sorted(expected, key=str) == sorted(
+            [(row["K"], row["X"], row["Y"]) for row in memory], key=str
+        )
+
+
+def test_dedup_csv_paths_agree(tmp_path):
+    rows = [[str(random.randint(0, 300)), str(i)] for i in range(3000)]
+    source = write_rows(tmp_path / "source.csv", ["Key", "Index"], rows)
+    seen = set()
+    expected = []
+    for row in rows:
+        if row[0] not in seen:
+            seen.add(row[0])
+            expected.append(row)
+    for destination, max_keys in (("memory.csv", 1 << 20), ("spill.csv.gz", 50)):
+        destination = str(tmp_path / destination)
+        commoner.dedup_csv(source, destination, "Key", max_keys=max_keys, partitions=7)
+        assert read_rows(destination) == [["Key", "Index"]] + expected
+    destination = str(tmp_path / "bloom.csv")
+    commoner.dedup_csv(source, destination, "Key", bloom=True)
+    assert read_rows(destination) == [["Key", "Index"]] + expected
+
+
+def test_dedup_csv_keeps_destination_on_error(tmp_path):
+    source = write_rows(tmp_path / "source.csv", ["K", "V"], [["1", "a"], ["1", "b"]])
+    destination = tmp_path / "keep.csv"
+    destination.write_text("precious\n")
+    commoner.dedup_csv(source, str(destination), "Typo")
+    assert destination.read_text() == "precious\n"
+    commoner.dedup_csv(source, source, "K")
+    assert read_rows(source) == [["K", "V"], ["1", "a"]]
+
+
+def test_read_csv_columns_widens_types(tmp_path):
+    rows = [[str(i), "x"] for i in range(1500)]
+    rows[1200][0] = ""
+    file = write_rows(tmp_path / "columns.csv", ["A", "B"], rows)
+    column = commoner.read_csv_columns(file)["A"]
+    assert column.dtype == numpy.float64 and numpy.isnan(column[1200]) and column[1201] == 1201
+
+    rows[1200][0] = "n/a"
+    file = write_rows(tmp_path / "columns.csv", ["A", "B"], rows)
+    column = commoner.read_csv_columns(file)["A"]
+    assert column.dtype == object and list(column[1199:1202]) == ["1199", "n/a", "1201"]
+
+    column = commoner.read_csv_columns(file, dtypes={"B": str})["B"]
+    assert column.dtype == object and column[0] == "x"
+
+
+def test_read_csv_columns_cache(tmp_path):
+    rows = [[str(i), f"name{i}"] for i in range(100)]
+    file = write_rows(tmp_path / "columns.csv", ["A", "S"], rows)
+    cold = commoner.read_csv_columns(file)
+    assert (
+        commoner.read_csv_columns(file, dtypes={"A": numpy.float32}, cache=True)["A"].dtype
+        == numpy.float32
+    )
+    for _ in range(2):
+        warm = commoner.read_csv_columns(file, cache=True)
+        assert warm["A"].dtype == cold["A"].dtype
+        assert list(warm["A"]) == list(cold["A"]) and list(warm["S"]) == list(cold["S"])
+
+
+def test_write_csv_atomic_mode(tmp_path):
+    file = str(tmp_path / "out.csv")
+    commoner.write_csv(file, [{"A": "1"}], atomic=True)
+    umask = os.umask(0)
+    os.umask(umask)
+    assert os.stat(file).st_mode & 0o777 == 0o666 & ~umask
+    with pytest.raises(ValueError):
+        commoner.write_csv(file, [{"A": "1"}], buffer_size=1)
+
+
+def test_byte_offset_readers_reject_compressed_files(tmp_path):
+    file = str(tmp_path / "rows.csv.gz")
+    with gzip.open(file, "wt") as f:
+        f.write("A,B\n1,2\n")
+    assert commoner.read_csv(file) == [{"A": "1", "B": "2"}]
+    with pytest.raises(ValueError):
+        commoner.read_csv_parallel(file)
+    with pytest.raises(ValueError):
+        commoner.CsvMap(file)
+    with pytest.raises(ValueError):
+        commoner.CsvIndex(file, "A")
@@ -0,0 +1,167 @@
+import csv
+import random
+
+import pytest
+
+from commoner.math import (
+    alignment,
+    cluster_csv,
+    distance,
+    distance_many,
+    fuzzy_find,
+    osa_distance,
+    within_distance,
+    _levenshtein_matrix,
+)
+
+
+def random_token(alphabet="abc", low=0, high=12):
+    return "".join(random.choice(alphabet) for _ in range(random.randint(low, high)))
+
+
+def matrix_distance(token1, token2):
+    return int(_levenshtein_matrix(token1, token2)[len(token1)][len(token2)])
+
+
+def reference_osa(token1, token2):
+    rows = [[0] * (len(token2) + 1) for _ in range(len(token1) + 1)]
+    for t1 in range(len(token1) + 1):
+        rows[t1][0] = t1
+    for t2 in range(len(token2) + 1):
+        rows[0][t2] = t2
+    for t1 in range(1, len(token1) + 1):
+        for t2 in range(1, len(token2) + 1):
+            cost = token1[t1 - 1] != token2[t2 - 1]
+            rows[t1][t2] = min(
+                rows[t1 - 1][t2] + 1, rows[t1][t2 - 1] + 1, rows[t1 - 1][t2 - 1] + cost
+            )
+            if (
+                t1 > 1
+                and t2 > 1
+                and token1[t1 - 1] == token2[t2 - 2]
+                and token1[t1 - 2] == token2[t2 - 1]
+            ):
+                rows[t1][t2] = min(rows[t1][t2], rows[t1 - 2][t2 - 2] + 1)
+    return rows[len(token1)][len(token2)]
+
+
+def apply_alignment(token1, token2, operations):
+    result = []
+    position = 0
+    for operation, i, j in operations:
+        result.append(token1[position:i])
+        if operation == "substitute":
+            result.append(token2[j])
+            position = i + 1
+        elif operation == "delete":
+            position = i + 1
+        else:
+            result.append(token2[j])
+            position = i
+    result.append(token1[position:])
+    return "".join(result)
+
+
+@pytest.fixture(autouse=True)
+def seed():
+    random.seed(0)
+
+
+def test_distance_matches_matrix():
+    for _ in range(500):
+        token1, token2 = random_token(), random_token()
+        expected = matrix_distance(token1, token2)
+        assert distance(token1, token2) == expected
+        for max_distance in range(4):
+            assert distance(token1, token2, max_distance=max_distance) == min(
+                expected, max_distance + 1
+            )
+            assert within_distance(token1, token2, max_distance) == (expected <= max_distance)
+
+
+def test_distance_long_tokens():
+    token1 = random_token("acgt", 1500, 1500)
+    token2 = list(token1)
+    for _ in range(40):
+        token2[random.randrange(len(token2))] = random.choice("acgt")
+    token2 = "".join(token2)
+    expected = matrix_distance(token1, token2)
+    assert distance(token1, token2) == expected
+    assert distance(token1, token2, max_distance=1) == 2
+    assert distance(token1, token2, max_distance=expected) == expected
+    assert osa_distance(token1, token2) == reference_osa(token1, token2)
+
+
+def test_osa_distance_matches_reference():
+    for _ in range(500):
+        token1, token2 = random_token(), random_token()
+        expected = reference_osa(token1, token2)
+        assert osa_distance(token1, token2) == expected
+        assert osa_distance(token1, token2, max_distance=2) == min(expected, 3)
+
+
+def test_alignment_is_minimal():
+    for _ in range(300):
+        token1, token2 = random_token(), random_token()
+        operations = alignment(token1, token2)
+        assert len(operations) == matrix_distance(token1, token2)
+        assert apply_alignment(token1, token2, operations) == token2
+
+
+def test_fuzzy_find_matches_brute_force():
+    for _ in range(200):
+        pattern = random_token(low=1, high=5)
+        text = random_token(low=0, high=15)
+        max_distance = random.randint(0, 2)
+        expected = []
+        for end in range(1, len(text) + 1):
+            best = min(distance(pattern, text[start:end]) for start in range(end + 1))
+            if best <= max_distance:
+                expected.append((end, best))
+        assert list(fuzzy_find(pattern, text, max_distance)) == expected
+
+
+def test_distance_many_metrics():
+    assert list(distance_many("abc", ["abd", "ab", "xyz"], metric="hamming")) == [1, -1, 3]
+    assert list(distance_many("abc", ["acb", "abcdef"], metric="osa", max_distance=1)) == [
+        1,
+        2,
+    ]
+    with pytest.raises(ValueError):
+        distance_many("abc", ["abd"], metric="hamming", max_distance=1)
+
+
+def test_cluster_csv_matches_single_linkage(tmp_path):
+    for _ in range(20):
+        values = [random_token("ab", 0, 6) for _ in range(50)]
+        max_distance = random.randint(0, 3)
+        file = tmp_path / "values.csv"
+        with open(file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Name"])
+            writer.writerows([value] for value in values)
+
+        parents = list(range(len(values)))
+
+        def find(node):
+            while parents[node] != node:
+                node = parents[node]
+            return node
+
+        for i in range(len(values)):
+            for j in range(i):
+                if distance(values[i], values[j]) <= max_distance:
+                    parents[find(i)] = find(j)
+        clusters = {}
+        for i in range(len(values)):
+            clusters[find(i)] = min(clusters.get(find(i), i), i)
+        expected = [(i, value, clusters[find(i)]) for i, value in enumerate(values)]
+
+        assert sorted(cluster_csv("Name", str(file), max_distance)) == expected
+
+
+def test_cluster_csv_checks_arguments_on_call():
+    with pytest.raises(TypeError):
+        cluster_csv(1, "values.csv")
+    with pytest.raises(ValueError):
+        cluster_csv("Name", "values.csv", block="unknown")